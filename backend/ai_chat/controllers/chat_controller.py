@@ -9,6 +9,7 @@ chat_bp = Blueprint("chat", __name__, url_prefix="/chat")
 
 # Import service from services directory
 from services.chat_service import ChatService
+from orchestrator.orchestrator import parse_mentor_options
 service = ChatService()
 
 @chat_bp.route("/message", methods=["POST"])
@@ -78,8 +79,13 @@ def guidance():
     body = request.get_json(force=True) or {}
     user_id = _normalize_user_id(body.get("user_id", 1))
     message = body.get("message", "career guidance")
+    # optional mentor filters: {"departments": [...], "levels": [...], "available_only": true}
     try:
-        result = service.generate_career_guidance(user_id, message, {})
+        context = {"mentor_options": parse_mentor_options(body.get("mentor_options"))}
+    except ValueError as e:
+        return jsonify({"Code": 400, "Message": str(e)}), 400
+    try:
+        result = service.generate_career_guidance(user_id, message, context)
         code = result.pop("Code", 200)
         return jsonify(result), code
     except Exception as e:
@@ -89,8 +95,9 @@ def guidance():
 @chat_bp.get("/health")
 def health():
     from shared.database import get_db_connection
+    from orchestrator.orchestrator import index_status, plan_store_status
     db = get_db_connection()
-    return {"db": "ready" if db.ready() else "demo"}
+    return {"db": "ready" if db.ready() else "demo", **index_status(), "plan_store": plan_store_status()}
 
 @chat_bp.route("/test", methods=["GET"])
 def test():
@@ -1,20 +1,24 @@
 # backend/ai_chat/orchestrator/orchestrator.py
 from dotenv import load_dotenv; load_dotenv()
 
-import os, json
+import os, json, time
 import sys
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, Optional
 
 # Add the backend directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
 from shared.leadership import leadership_score
-from recommendations.bootstrap_indices import load_roles, load_courses, load_mentors
+from shared.mentor_search import JOB_LEVELS, DEFAULT_LEVEL
+from recommendations.bootstrap_indices import load_all, index_fingerprint
+from shared.index_registry import IndexRegistry
+from shared.plan_store import PlanStore, Refresher
 from shared.recommender import (
-    role_recommendations, skill_gaps, top_courses_for_gaps, top_mentors, assemble_plan
+    role_recommendations, skill_gaps, top_courses_for_gaps, top_mentors, assemble_plan,
+    role_recommendations_many, skill_gaps_many, top_mentors_many
 )
-from ai_chat.llm_client import summarize
+from ai_chat.llm_client import summarize, summarize_plan_with_mock
 
 # --- data dir helper (works from anywhere; override with BACKEND_DATA_DIR) ---
 def _data_dir() -> Path:
@@ -26,26 +30,46 @@ def _data_dir() -> Path:
 
 PROFILE_CACHE = _data_dir() / "profile_cache.json"
 
-# lazy-load indices once per process
-_ROLES = _COURSES = _MENTORS = None
-def _ensure_indices():
-    global _ROLES, _COURSES, _MENTORS
-    if _ROLES is None:
-        _ROLES   = load_roles()
-        _COURSES = load_courses()
-        _MENTORS = load_mentors()
+# employees per matrix batch in run_full_plans
+PLAN_BATCH_SIZE = max(1, int(os.getenv("PLAN_BATCH_SIZE", "512")))
+
+# indices load lazily on first use and hot-reload when the manifest / files change
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "30"))
+_REGISTRY = IndexRegistry(load_all, index_fingerprint, poll_seconds=INDEX_POLL_SECONDS)
+
+def index_version() -> str:
+    """Version tag of the index generation currently being served."""
+    return _REGISTRY.current().version
+
+def index_status() -> Dict:
+    """Served version without forcing a load (for health checks)."""
+    return {"index_version": _REGISTRY.version, "index_error": _REGISTRY.last_error}
 
 # backend/ai_chat/orchestrator/orchestrator.py
 
+_profile_cache = {"mtime": None, "data": {}}
+
+def _load_profile_cache() -> Dict:
+    """Parsed profile cache, re-read only when the file changes on disk."""
+    mtime = os.stat(PROFILE_CACHE).st_mtime_ns
+    if _profile_cache["mtime"] != mtime:
+        with open(PROFILE_CACHE, "r", encoding="utf-8") as f:
+            _profile_cache["data"] = json.load(f)
+        _profile_cache["mtime"] = mtime
+    return _profile_cache["data"]
+
+def _employee(cache: Dict, key: str) -> Dict:
+    # profile_key: the cache key (also the plan store key); employee_id: the canonical
+    # id the entry was built from ("EMP-..."), which catalog rows such as mentors use
+    entry = cache[key]
+    return {**entry, "employee_id": str(entry.get("employee_id") or key), "profile_key": key}
+
 def _get_employee(user_id: int) -> Dict:
-    with open(PROFILE_CACHE, "r", encoding="utf-8") as f:
-        cache = json.load(f)
+    cache = _load_profile_cache()
 
     # 1) exact match ("1", "2", ...)
-    entry = cache.get(str(user_id))
-    if entry:
-        entry["employee_id"] = str(user_id)
-        return entry
+    if str(user_id) in cache:
+        return _employee(cache, str(user_id))
 
     # 2) tolerant mapping:
     # If we somehow got a large number (e.g., 20001 from "EMP-20001"),
@@ -54,26 +78,105 @@ def _get_employee(user_id: int) -> Dict:
         tail = str(user_id)[-2:]
         if tail.isdigit():
             short = str(int(tail))  # "01" -> "1"
-            entry = cache.get(short)
-            if entry:
-                entry["employee_id"] = short
-                return entry
+            if short in cache:
+                return _employee(cache, short)
 
     # 3) last-ditch fallback: first available user in cache (demo mode resilience)
     if cache:
-        first_key = sorted(cache.keys(), key=lambda k: int(k))[0]
-        entry = cache[first_key]
-        entry["employee_id"] = first_key
-        return entry
+        first_key = sorted(cache.keys(), key=lambda k: int(k) if k.isdigit() else float("inf"))[0]
+        return _employee(cache, first_key)
 
     # If nothing at all, keep the original explicit error (useful during setup)
     raise ValueError(f"user_id {user_id} not found in profile cache at {PROFILE_CACHE}")
 
-def run_full_plan(user_id: int) -> Dict:
-    _ensure_indices()
+# leadership signals used until real ones are wired in
+DEFAULT_SIGNALS = {"training_completion": 0.55, "recognition_count": 2, "engagement": 0.7, "positive_feedback_ratio": 0.65}
+
+# query options accepted for mentor matching (see recommender.top_mentors)
+MENTOR_OPTIONS = ("departments", "levels", "available_only", "exclude_self")
+_BOOLEANS = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+
+def _option_names(key: str, value) -> List[str]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) and v.strip() for v in value):
+        raise ValueError(f"mentor_options.{key} must be a string or a list of strings, got {value!r}")
+    return value
+
+def _option_bool(key: str, value) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in _BOOLEANS:
+        return _BOOLEANS[value.strip().lower()]
+    raise ValueError(f"mentor_options.{key} must be a boolean, got {value!r}")
+
+def parse_mentor_options(options, mentors=None) -> Dict:
+    """
+    top_mentors keyword arguments from client mentor options (e.g. /chat/guidance).
+    A single department / level string becomes a list and flags accept "true"/"false";
+    anything that would otherwise quietly match nothing raises ValueError: unknown keys,
+    unknown levels, departments missing from the `mentors` catalog (default: the served
+    one) and values of the wrong type. Null values count as absent.
+    """
+    if not options:
+        return {}
+    if not isinstance(options, dict):
+        raise ValueError(f"mentor_options must be an object, got {options!r}")
+    unknown = sorted(set(options) - set(MENTOR_OPTIONS))
+    if unknown:
+        raise ValueError(f"unknown mentor_options {unknown}; expected any of {list(MENTOR_OPTIONS)}")
+    out: Dict = {}
+    for key, value in options.items():
+        if value is None:
+            continue
+        out[key] = _option_names(key, value) if key in ("departments", "levels") else _option_bool(key, value)
+
+    level_names = [level for level, _ in JOB_LEVELS] + [DEFAULT_LEVEL]
+    bad = [lv for lv in out.get("levels", []) if lv.strip().lower() not in level_names]
+    if bad:
+        raise ValueError(f"unknown mentor levels {bad}; expected any of {level_names}")
+    if out.get("departments"):
+        mentors = mentors if mentors is not None else _REGISTRY.current()["mentors"]
+        search = getattr(mentors, "mentor_search", None)
+        bad = [d for d in out["departments"] if search is not None and not search.has_department(d)]
+        if bad:
+            raise ValueError(f"unknown mentor departments {bad}")
+    return out
+
+def _vector_mismatch(employee: Dict, gen) -> Optional[str]:
+    """
+    Why the employee's cached vectors cannot be scored against this index generation
+    (e.g. embedded by another provider), or None when their widths match the catalogs.
+    """
+    dims = gen["roles"].matrix.shape[1]
+    skills = gen["skills"].catalog.matrix
+    if skills.ndim == 2 and skills.shape[0] and skills.shape[1] != dims:
+        return f"skill index has {skills.shape[1]} dims, role index {dims}"
+    for field in ("vector", "query_vector"):
+        vec = employee.get(field)
+        if vec is not None and len(vec) != dims:
+            return f"{field} has {len(vec)} dims, index has {dims} (re-run the profile build)"
+    return None
+
+def _summary(plan: Dict, leader: Dict) -> str:
+    try:
+        return summarize(plan, leader)
+    except Exception as e:
+        return f"Summary unavailable ({e}). Target: {plan.get('target_role')} • Fit {plan.get('fit_score')}%"
+
+def run_full_plan(user_id: int, mentor_options: Optional[Dict] = None) -> Dict:
+    """mentor_options: optional top_mentors filters, e.g. {"departments": ["Finance"], "levels": ["manager"]}."""
+    # one generation per request, so a hot swap never mixes catalogs mid-plan
+    gen = _REGISTRY.current()
+    _ROLES, _COURSES, _MENTORS = gen["roles"], gen["courses"], gen["mentors"]
 
     # 1) employee profile
     employee = _get_employee(user_id)
+    mismatch = _vector_mismatch(employee, gen)
+    if mismatch:
+        raise ValueError(f"Profile {employee['employee_id']} cannot be planned: {mismatch}")
 
     # 2) roles → best role
     role_hits = role_recommendations(employee, _ROLES, top_k=5)
@@ -83,24 +186,153 @@ def run_full_plan(user_id: int) -> Dict:
     target_role = next(r for r in _ROLES if r["id"] == best_hit["role_id"])
 
     # 3) gaps, 4) courses/mentors
-    gaps    = skill_gaps(employee, target_role, top_k=6)
+    gaps    = skill_gaps(employee, target_role, top_k=6, skill_vectors=gen["skills"])
     courses = top_courses_for_gaps(gaps, _COURSES, top_k=5)
-    ments   = top_mentors(employee, _MENTORS, top_k=3)
+    ments   = top_mentors(employee, _MENTORS, top_k=3, **parse_mentor_options(mentor_options, _MENTORS))
 
     # 5) plan + leadership
     plan   = assemble_plan(employee, best_hit, gaps, courses, ments)
-    signals = {"training_completion": 0.55, "recognition_count": 2, "engagement": 0.7, "positive_feedback_ratio": 0.65}
-    leader = leadership_score(signals)
+    leader = leadership_score(DEFAULT_SIGNALS)
 
     # 6) summary (LLM with safe fallback)
-    try:
-        summary = summarize(plan, leader)
-    except Exception as e:
-        summary = f"Summary unavailable ({e}). Target: {plan.get('target_role')} • Fit {plan.get('fit_score')}%"
+    summary = _summary(plan, leader)
 
     return {
         "plan": plan,
         "leadership": leader,
         "summary": summary,
         "alternatives": role_hits[1:3],
-    }
\ No newline at end of file
+        "index_version": gen.version,
+    }
+
+def _iter_full_plans(gen, cache: Dict, ids: List, batch_size: int = PLAN_BATCH_SIZE,
+                     mentor_options: Optional[Dict] = None, with_summary: bool = False,
+                     failed: Optional[List] = None) -> Iterator[Dict]:
+    """
+    Yield one plan record per employee of `ids` (exact profile cache keys), batch by batch:
+    distinct role queries are embedded in one call, and roles, gaps and mentors are
+    scored like run_full_plan (the *_many recommender functions use the same search
+    engines), so a record equals the live plan. Every record carries a summary: the
+    LLM one with `with_summary`, else the deterministic template summarize() falls back to.
+    Employees that cannot be planned go to `failed`.
+    """
+    _ROLES, _COURSES, _MENTORS = gen["roles"], gen["courses"], gen["mentors"]
+    roles_by_id = {r["id"]: r for r in _ROLES}
+    mentor_kwargs = parse_mentor_options(mentor_options, _MENTORS)
+    leader = leadership_score(DEFAULT_SIGNALS)
+    failed = failed if failed is not None else []
+    batch_size = max(1, int(batch_size))  # 0 / negative would slice empty batches and plan nobody
+
+    for start in range(0, len(ids), batch_size):
+        batch = []
+        for uid in ids[start:start+batch_size]:
+            # exact ids only: the demo fallbacks of _get_employee would plan for someone else
+            entry = cache.get(str(uid))
+            if not entry or not entry.get("vector"):
+                failed.append({"user_id": uid, "error": "not found in profile cache"})
+                continue
+            mismatch = _vector_mismatch(entry, gen)
+            if mismatch:  # one stale profile must not sink the whole batch's matrix products
+                failed.append({"user_id": uid, "error": mismatch})
+                continue
+            batch.append((uid, _employee(cache, str(uid))))
+        if not batch:
+            continue
+        employees = [e for _, e in batch]
+
+        role_hits = role_recommendations_many(employees, _ROLES, top_k=5)
+        targets = [roles_by_id[h[0]["role_id"]] if h else {} for h in role_hits]
+        gaps = skill_gaps_many(employees, targets, top_k=6, skill_vectors=gen["skills"])
+        ments = top_mentors_many(employees, _MENTORS, top_k=3, **mentor_kwargs)
+        course_memo: Dict[frozenset, List[Dict]] = {}  # employees with the same gaps share a result
+
+        for (uid, employee), hits, g, m in zip(batch, role_hits, gaps, ments):
+            if not hits:
+                failed.append({"user_id": uid, "error": "No suitable roles found for this profile"})
+                continue
+            key = frozenset(x["skill"] for x in g[:4])
+            if key not in course_memo:
+                course_memo[key] = top_courses_for_gaps(g, _COURSES, top_k=5)
+            plan = assemble_plan(employee, hits[0], g, course_memo[key], m)
+            summary = _summary(plan, leader) if with_summary else summarize_plan_with_mock(plan, leader)
+            yield {"user_id": uid, "plan": plan, "leadership": leader, "summary": summary,
+                   "alternatives": hits[1:3], "index_version": gen.version}
+
+def run_full_plans(user_ids: Optional[Iterable] = None, out_path: Optional[str] = None,
+                   batch_size: int = PLAN_BATCH_SIZE, mentor_options: Optional[Dict] = None,
+                   with_summary: bool = False) -> Dict:
+    """
+    Plans for many employees (default: everyone in the profile cache), streamed to
+    `out_path` as JSON Lines, one {"user_id", "plan", "leadership", "summary",
+    "alternatives", "index_version"} object per employee (see _iter_full_plans).
+    with_summary=True writes the per-employee LLM summary (slow; off for nightly runs)
+    instead of the template one.
+    Returns run stats; employees that fail are listed in "failed" and skipped.
+    """
+    gen = _REGISTRY.current()
+    cache = _load_profile_cache()
+    ids = list(user_ids) if user_ids is not None else list(cache)
+    out_path = Path(out_path) if out_path else _data_dir() / f"plans_{gen.version}.jsonl"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    written, failed = 0, []
+    t0 = time.perf_counter()
+    with open(out_path, "w", encoding="utf-8") as out:
+        for rec in _iter_full_plans(gen, cache, ids, batch_size, mentor_options, with_summary, failed):
+            out.write(json.dumps(rec, default=str) + "\n")
+            written += 1
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "path": str(out_path),
+        "written": written,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "per_minute": round(60 * written / elapsed, 1) if elapsed else None,
+        "index_version": gen.version,
+    }
+
+# --- materialized plans: lookup first, live computation on a miss ---
+PLAN_STORE = PlanStore(os.getenv("PLAN_STORE_PATH") or str(_data_dir() / "plan_store.sqlite"))
+PLAN_REFRESH_SECONDS = float(os.getenv("PLAN_REFRESH_SECONDS", "300"))  # 0 disables the background job
+# LLM summaries in background refreshes run once per stale employee in every worker process;
+# off by default: refreshed plans then carry the deterministic template summary
+PLAN_STORE_SUMMARIES = os.getenv("PLAN_STORE_SUMMARIES", "false").lower() == "true"
+
+def refresh_plan_store() -> int:
+    """Recompute plans whose profile hash or index version changed; returns how many were written."""
+    gen = _REGISTRY.current()
+    cache = _load_profile_cache()
+    hashes = {uid: e.get("hash", "") for uid, e in cache.items()}
+    stale = PLAN_STORE.stale("plan", hashes, gen.version)
+    written = 0
+    for start in range(0, len(stale), PLAN_BATCH_SIZE):
+        recs = list(_iter_full_plans(gen, cache, stale[start:start+PLAN_BATCH_SIZE],
+                                     with_summary=PLAN_STORE_SUMMARIES))
+        PLAN_STORE.put_many("plan", [(r["user_id"], hashes[r["user_id"]], gen.version, r) for r in recs])
+        written += len(recs)
+    return written
+
+_REFRESHER = Refresher(refresh_plan_store, PLAN_REFRESH_SECONDS)
+
+def get_plan(user_id, mentor_options: Optional[Dict] = None) -> Dict:
+    """
+    run_full_plan served from the materialized store when the stored plan matches the
+    employee's current profile hash and the served index version; computed live (and
+    stored) otherwise. Filtered mentor queries are always live.
+    """
+    _REFRESHER.start()
+    if mentor_options:
+        return run_full_plan(user_id, mentor_options=mentor_options)
+    employee = _get_employee(user_id)
+    key, profile_hash, version = employee["profile_key"], employee.get("hash", ""), index_version()
+    hit = PLAN_STORE.get("plan", key, profile_hash, version)
+    if hit is not None:
+        return hit
+    result = run_full_plan(user_id)
+    if result.get("index_version") == version:
+        PLAN_STORE.put("plan", key, profile_hash, version, {**result, "user_id": key})
+    return result
+
+def plan_store_status() -> Dict:
+    return {**PLAN_STORE.stats(), "refresh": _REFRESHER.status()}
@@ -5,7 +5,7 @@ from typing import Dict, Any, Optional
 from datetime import datetime, UTC
 import traceback
 from repo.chat_repo import ChatRepo
-from orchestrator.orchestrator import run_full_plan
+from orchestrator.orchestrator import get_plan
 from llm_client import summarize, llm_reply
 
 class ChatService:
@@ -102,7 +102,7 @@ class ChatService:
     def generate_career_guidance(self, user_id: int, message: str, context: Dict[str, Any]) -> Dict[str, Any]:
         try:
             # 1) Core plan
-            result       = run_full_plan(user_id)
+            result       = get_plan(user_id, mentor_options=(context or {}).get("mentor_options"))
             plan         = result.get("plan") or {}
             leadership   = result.get("leadership") or {}
             summary      = result.get("summary") or "Here’s a personalized plan."
@@ -206,7 +206,7 @@ class ChatService:
         conversation_snippet = "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
 
         # 2) run your orchestrator (deterministic plan + leadership)
-        result = run_full_plan(user_id)
+        result = get_plan(user_id)
 
         # 3) tone prompt (optional context for future upgrades)
         user_profile = context.get("user_profile", {})
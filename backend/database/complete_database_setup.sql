@@ -43,7 +43,8 @@ CREATE TABLE IF NOT EXISTS courses (
     description TEXT,
     duration_weeks INTEGER,
     required_skills TEXT[], -- Array of skill names
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- Career Pathways (for recommendations)
@@ -53,7 +54,8 @@ CREATE TABLE IF NOT EXISTS career_pathways (
     description TEXT,
     target_role VARCHAR(255),
     required_skills TEXT[], -- Array of skill names
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- AI Chat Sessions
@@ -251,6 +253,28 @@ CREATE INDEX IF NOT EXISTS idx_ai_chat_sessions_user_id ON ai_chat_sessions(user
 CREATE INDEX IF NOT EXISTS idx_ai_chat_messages_session_id ON ai_chat_messages(session_id);
 CREATE INDEX IF NOT EXISTS idx_skills_category ON skills(category);
 
+-- Catalog change tracking: the recommendations service caches courses and career
+-- pathways in-process and only re-fetches rows with updated_at past its watermark
+ALTER TABLE courses ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+ALTER TABLE career_pathways ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_courses_updated_at ON courses;
+CREATE TRIGGER trg_courses_updated_at BEFORE UPDATE ON courses
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+DROP TRIGGER IF EXISTS trg_career_pathways_updated_at ON career_pathways;
+CREATE TRIGGER trg_career_pathways_updated_at BEFORE UPDATE ON career_pathways
+    FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_courses_updated_at ON courses(updated_at);
+CREATE INDEX IF NOT EXISTS idx_career_pathways_updated_at ON career_pathways(updated_at);
+
 -- ==============================================
 -- STEP 10: VERIFICATION QUERIES
 -- ==============================================
@@ -1,9 +1,25 @@
 # backend/recommendations/bootstrap_indices.py
 from dotenv import load_dotenv; load_dotenv()
-import os, json
+import os, json, hashlib
+import sys
 from pathlib import Path
 from typing import List, Dict
 
+import numpy as np
+
+# Add the backend directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from shared.embeddings import VectorCatalog
+from shared.index_store import load_binary_index, read_manifest, save_binary_index
+from shared.ann import search_index_for
+from shared.lexical_index import BM25Index
+from shared.shared_matrix import share_matrix, CATALOG_SHARED_MEMORY
+from shared.recommender import role_text
+from shared.skill_vectors import SkillVectorStore
+from shared.skill_index import InvertedSkillIndex
+from shared.mentor_search import MentorSearch
+
 def _data_dir() -> Path:
     env = os.getenv("BACKEND_DATA_DIR")
     if env:
@@ -33,11 +49,69 @@ def _load_json(name: str) -> List[Dict]:
     with open(p, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def load_roles() -> List[Dict]:
-    return _load_json("index_roles.json")
+def _load_index(name: str, text_fn=None) -> VectorCatalog:
+    """Memory-map the binary index when present; otherwise import the legacy JSON."""
+    cat = load_binary_index(_data_dir(), name)
+    if cat is None:
+        cat = VectorCatalog.from_rows(_load_json(f"index_{name}.json"), text_fn=text_fn)
+        if cat.info.get("embedded"):
+            # rows had no stored vector: persist what was just embedded so no later load
+            # (or request) pays for it again
+            try:
+                save_binary_index(cat, _data_dir(), name)
+                cat = load_binary_index(_data_dir(), name) or cat
+            except OSError as e:
+                print(f"[WARN] Could not persist embedded '{name}' vectors: {e}")
+    # in-process matrices (JSON path) move into node-wide shared memory; memmaps are shared already
+    if CATALOG_SHARED_MEMORY and not isinstance(cat.matrix, np.memmap) and cat.matrix.size:
+        version = cat.info.get("checksum") or hashlib.sha1(np.ascontiguousarray(cat.matrix).tobytes()).hexdigest()
+        cat.matrix = share_matrix(f"{name}:{version}", cat.matrix)
+    # exact scan for small catalogs, persisted IVF index (index_<name>.ivf.npz) for large ones
+    cat.ann = search_index_for(cat.matrix, _data_dir(), name, checksum=cat.info.get("checksum", ""))
+    # BM25 prefilter for hybrid search, when the catalog build produced one for this index
+    cat.lexical = BM25Index.load(_data_dir() / f"index_{name}.bm25.npz", len(cat), checksum=cat.info.get("checksum", ""))
+    return cat
+
+# Loaders return VectorCatalogs: rows without vectors plus a pre-normalized float32 matrix
+def load_roles() -> VectorCatalog:
+    return _load_index("roles", text_fn=role_text)
+
+def load_courses() -> VectorCatalog:
+    cat = _load_index("courses")
+    cat.skill_index = InvertedSkillIndex(cat)  # normalized skill -> courses, for gap matching
+    return cat
+
+def load_mentors() -> VectorCatalog:
+    cat = _load_index("mentors")
+    cat.mentor_search = MentorSearch(cat)  # department / level / availability masks
+    return cat
+
+def load_skills() -> SkillVectorStore:
+    """Skill vocabulary vectors; unseen skills are embedded lazily into <data>/.skill_vectors."""
+    try:
+        cat = _load_index("skills")
+    except FileNotFoundError:
+        cat = None  # catalog built before the skills index existed: everything is lazy
+    return SkillVectorStore(cat, extras_dir=_data_dir() / ".skill_vectors")
+
+INDEX_NAMES = ("roles", "courses", "mentors", "skills")
 
-def load_courses() -> List[Dict]:
-    return _load_json("index_courses.json")
+def load_all() -> Dict[str, object]:
+    return {"roles": load_roles(), "courses": load_courses(), "mentors": load_mentors(),
+            "skills": load_skills()}
 
-def load_mentors() -> List[Dict]:
-    return _load_json("index_mentors.json")
\ No newline at end of file
+def index_fingerprint() -> str:
+    """
+    Short version tag that changes whenever an index on disk changes:
+    manifest version + checksums for binary indices, mtimes for legacy JSON.
+    """
+    d = _data_dir()
+    manifest = read_manifest(d)
+    parts = [str(manifest.get("version", 0))]
+    parts += [f"{n}:{e.get('checksum', '')}" for n, e in sorted(manifest.get("indices", {}).items())]
+    for n in INDEX_NAMES:
+        p = d / f"index_{n}.json"
+        if p.exists():
+            parts.append(f"{n}.json:{p.stat().st_mtime_ns}")
+    digest = hashlib.sha1("|".join(parts).encode()).hexdigest()[:12]
+    return f"v{manifest.get('version', 0)}-{digest}"
@@ -2,15 +2,35 @@ import sys
 sys.path.append('..')
 from typing import Dict, Any, Optional, List
 from datetime import datetime, UTC
+import hashlib
 import json
 import os
 from pathlib import Path
 from shared.database import get_db_connection
+from shared.skill_normalizer import normalize_list
+from shared.plan_store import PlanStore, Refresher
+from shared.catalog_cache import TableCache
+from shared.match_scoring import MatchScorer, warm_row
 
 class RecommendationsService:
     def __init__(self, repo: Optional[None] = None):
         self.db = get_db_connection()
         self.user_profiles = self._load_user_profiles()
+        # profile hashes + materialized dashboard results (refreshed in the background)
+        self.profile_hashes = {
+            user_id: hashlib.sha1(json.dumps(p, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+            for user_id, p in self.user_profiles.items()
+        }
+        self.store = PlanStore(os.getenv("PLAN_STORE_PATH") or str(
+            (Path(__file__).parent / ".." / ".." / "data" / "plan_store.sqlite").resolve()))
+        self._refresher = Refresher(self.refresh_materialized, float(os.getenv("PLAN_REFRESH_SECONDS", "300")),
+                                    name="dashboard-refresh")
+        # in-process catalog snapshots, refreshed from the updated_at watermark (see catalog_cache.py)
+        self.courses_cache = TableCache(lambda: self.db.client, "courses",
+                                        warm=lambda row: warm_row(row, "title"))
+        self.career_pathways_cache = TableCache(lambda: self.db.client, "career_pathways",
+                                                warm=lambda row: warm_row(row, "target_role"))
+        self._scorers: Dict[str, Any] = {}  # table -> (snapshot rows, MatchScorer)
     
     def _load_user_profiles(self) -> Dict[str, Any]:
         """Load user profiles from Employee_Profiles.json"""
@@ -47,15 +67,15 @@ class RecommendationsService:
         if not required_skills:
             return 0.0
         
-        user_skill_set = set(skill.lower().strip() for skill in user_skills)
-        required_skill_set = set(skill.lower().strip() for skill in required_skills)
-        
-        # Calculate overlap
-        overlap = len(user_skill_set.intersection(required_skill_set))
-        total_required = len(required_skill_set)
+        # Overlap of canonical skill names (same normalization as the recommender and MatchScorer)
+        required = set(normalize_list(required_skills))
+        overlap = len(required & set(normalize_list(user_skills)))
+        total_required = len(required)
+        if total_required == 0:  # nothing left after normalization
+            return 0.0
         
         # Base score from skill overlap
-        skill_score = (overlap / total_required) * 100 if total_required > 0 else 0
+        skill_score = (overlap / total_required) * 100
         
         # Bonus for having more than 50% of required skills
         if overlap >= total_required * 0.5:
@@ -103,70 +123,46 @@ class RecommendationsService:
         
         return min(similarity + seniority_bonus, 100)
     
-    def _find_best_course_matches(self, user_profile: Dict[str, Any], courses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Find best course matches for user"""
+    def _find_best_course_matches(self, user_profile: Dict[str, Any], courses: List[Dict[str, Any]],
+                                  scorer: Optional[MatchScorer] = None) -> List[Dict[str, Any]]:
+        """Find best course matches for user (scorer: prebuilt MatchScorer over `courses`)"""
         if not courses or not user_profile:
             return []
         
-        user_skills = [skill['skill_name'] for skill in user_profile.get('skills', [])]
-        user_job_title = user_profile.get('employment_info', {}).get('job_title', '')
-        
-        scored_courses = []
-        for course in courses:
-            required_skills = course.get('required_skills', [])
-            
-            # Calculate skill match score
-            skill_score = self._calculate_skill_match_score(user_skills, required_skills)
-            
-            # Calculate job title relevance score
-            job_title_score = self._calculate_job_title_match_score(user_job_title, course.get('title', ''))
-            
-            # Combined score (weighted: 70% skills, 30% job title)
-            combined_score = (skill_score * 0.7) + (job_title_score * 0.3)
-            
-            scored_courses.append({
-                **course,
-                'match_score': round(combined_score, 1),
-                'skill_match_score': round(skill_score, 1),
-                'job_title_score': round(job_title_score, 1)
-            })
-        
-        # Sort by match score and return top matches
-        scored_courses.sort(key=lambda x: x['match_score'], reverse=True)
-        return scored_courses[:3]  # Return top 3 matches
+        # Combined score (weighted: 70% skills, 30% job title), top 3
+        return self._top_matches(user_profile, courses, scorer or MatchScorer(courses, "title"),
+                                 "title", (0.7, 0.3), 3)
     
-    def _find_best_career_pathway_matches(self, user_profile: Dict[str, Any], career_pathways: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Find best career pathway matches for user"""
+    def _find_best_career_pathway_matches(self, user_profile: Dict[str, Any], career_pathways: List[Dict[str, Any]],
+                                          scorer: Optional[MatchScorer] = None) -> List[Dict[str, Any]]:
+        """Find best career pathway matches for user (scorer: prebuilt MatchScorer over `career_pathways`)"""
         if not career_pathways or not user_profile:
             return []
         
+        # Combined score (weighted: 60% skills, 40% job title progression), top 2
+        return self._top_matches(user_profile, career_pathways, scorer or MatchScorer(career_pathways, "target_role"),
+                                 "target_role", (0.6, 0.4), 2)
+    
+    def _top_matches(self, user_profile: Dict[str, Any], rows: List[Dict[str, Any]], scorer: MatchScorer,
+                     title_field: str, weights: tuple, k: int) -> List[Dict[str, Any]]:
+        """Rank every row in one vectorized pass, then build result entries for the top k only"""
         user_skills = [skill['skill_name'] for skill in user_profile.get('skills', [])]
         user_job_title = user_profile.get('employment_info', {}).get('job_title', '')
         
-        scored_pathways = []
-        for pathway in career_pathways:
-            required_skills = pathway.get('required_skills', [])
-            target_role = pathway.get('target_role', '')
-            
-            # Calculate skill match score
-            skill_score = self._calculate_skill_match_score(user_skills, required_skills)
-            
-            # Calculate job title progression score
-            job_title_score = self._calculate_job_title_match_score(user_job_title, target_role)
-            
-            # Combined score (weighted: 60% skills, 40% job title progression)
-            combined_score = (skill_score * 0.6) + (job_title_score * 0.4)
-            
-            scored_pathways.append({
-                **pathway,
+        matches = []
+        for pos in scorer.top(user_skills, user_job_title, k, weights).tolist():
+            row = rows[pos]
+            # the scalar scores for the few returned rows keep the response values (and int/float types) unchanged
+            skill_score = self._calculate_skill_match_score(user_skills, row.get('required_skills', []))
+            job_title_score = self._calculate_job_title_match_score(user_job_title, row.get(title_field, ''))
+            combined_score = (skill_score * weights[0]) + (job_title_score * weights[1])
+            matches.append({
+                **row,
                 'match_score': round(combined_score, 1),
                 'skill_match_score': round(skill_score, 1),
                 'job_title_score': round(job_title_score, 1)
             })
-        
-        # Sort by match score and return top matches
-        scored_pathways.sort(key=lambda x: x['match_score'], reverse=True)
-        return scored_pathways[:2]  # Return top 2 matches
+        return matches
     
     def get_user_recommendations(self, user_id: str) -> Dict[str, Any]:
         """Get all recommendations for user dashboard"""
@@ -176,122 +172,181 @@ class RecommendationsService:
             
             if not self.db.ready():
                 return self._get_demo_recommendations(user_id)
+            self._refresher.start()
             
-            # Fetch real data from Supabase
-            courses = self._fetch_courses()
-            career_pathways = self._fetch_career_pathways()
-            
-            recommendations = []
+            # Cached catalog snapshots (no database round trip once warm); rows and version
+            # come from the same snapshot, so a concurrent refresh cannot mislabel results
+            course_snapshot, career_pathway_snapshot = self._catalog_snapshots()
             
-            # Get intelligent course recommendations
-            if courses and user_profile:
-                best_courses = self._find_best_course_matches(user_profile, courses)
-                for course in best_courses:
-                    recommendations.append({
-                        "type": "course",
-                        "id": course["id"],
-                        "title": course["title"],
-                        "description": course["description"],
-                        "match_score": course["match_score"],
-                        "metadata": {
-                            "duration_weeks": course["duration_weeks"],
-                            "required_skills": course["required_skills"],
-                            "category": "Professional Development",
-                            "level": "Intermediate",
-                            "skill_match_score": course["skill_match_score"],
-                            "job_title_score": course["job_title_score"]
-                        }
-                    })
-            elif courses:
-                # Fallback to first course if no user profile
-                course = courses[0]
+            # Materialized result for this profile + catalog version, else compute live and store it
+            version = self._catalog_version(course_snapshot, career_pathway_snapshot)
+            profile_hash = self.profile_hashes.get(user_id, "")
+            stored = self.store.get("dashboard", user_id, profile_hash, version) if user_profile else None
+            if stored is not None:
+                recommendations = stored["recommendations"]
+            else:
+                recommendations = self._build_recommendations(user_profile, course_snapshot, career_pathway_snapshot)
+                if user_profile and version:
+                    self.store.put("dashboard", user_id, profile_hash, version, {"recommendations": recommendations})
+
+            return {
+                "Code": 200,
+                "Message": "Success",
+                "data": {
+                    "recommendations": recommendations
+                }
+            }
+        except Exception as e:
+            return {"Code": 500, "Message": f"Error generating recommendations: {str(e)}"}
+
+    def _build_recommendations(self, user_profile: Optional[Dict[str, Any]], course_snapshot: tuple,
+                               career_pathway_snapshot: tuple) -> List[Dict[str, Any]]:
+        """Ranked dashboard recommendations for one user against catalog snapshots (rows, warmed, version)"""
+        recommendations = []
+        courses, career_pathways = course_snapshot[0], career_pathway_snapshot[0]
+        
+        # Get intelligent course recommendations
+        if courses and user_profile:
+            best_courses = self._find_best_course_matches(
+                user_profile, courses, self._scorer("courses", course_snapshot, "title"))
+            for course in best_courses:
                 recommendations.append({
                     "type": "course",
                     "id": course["id"],
                     "title": course["title"],
                     "description": course["description"],
-                    "match_score": 85,
+                    "match_score": course["match_score"],
                     "metadata": {
                         "duration_weeks": course["duration_weeks"],
                         "required_skills": course["required_skills"],
                         "category": "Professional Development",
-                        "level": "Intermediate"
+                        "level": "Intermediate",
+                        "skill_match_score": course["skill_match_score"],
+                        "job_title_score": course["job_title_score"]
                     }
                 })
+        elif courses:
+            # Fallback to first course if no user profile
+            course = courses[0]
+            recommendations.append({
+                "type": "course",
+                "id": course["id"],
+                "title": course["title"],
+                "description": course["description"],
+                "match_score": 85,
+                "metadata": {
+                    "duration_weeks": course["duration_weeks"],
+                    "required_skills": course["required_skills"],
+                    "category": "Professional Development",
+                    "level": "Intermediate"
+                }
+            })
 
-            # Get intelligent career pathway recommendations
-            if career_pathways and user_profile:
-                best_pathways = self._find_best_career_pathway_matches(user_profile, career_pathways)
-                for pathway in best_pathways:
-                    recommendations.append({
-                        "type": "career",
-                        "id": pathway["id"],
-                        "title": pathway["name"],
-                        "description": pathway["description"],
-                        "match_score": pathway["match_score"],
-                        "metadata": {
-                            "target_role": pathway["target_role"],
-                            "required_skills": pathway["required_skills"],
-                            "skill_match_score": pathway["skill_match_score"],
-                            "job_title_score": pathway["job_title_score"]
-                        }
-                    })
-            elif career_pathways:
-                # Fallback to first pathway if no user profile
-                pathway = career_pathways[0]
+        # Get intelligent career pathway recommendations
+        if career_pathways and user_profile:
+            best_pathways = self._find_best_career_pathway_matches(
+                user_profile, career_pathways, self._scorer("career_pathways", career_pathway_snapshot, "target_role"))
+            for pathway in best_pathways:
                 recommendations.append({
                     "type": "career",
                     "id": pathway["id"],
                     "title": pathway["name"],
                     "description": pathway["description"],
-                    "match_score": 80,
+                    "match_score": pathway["match_score"],
                     "metadata": {
                         "target_role": pathway["target_role"],
-                        "required_skills": pathway["required_skills"]
+                        "required_skills": pathway["required_skills"],
+                        "skill_match_score": pathway["skill_match_score"],
+                        "job_title_score": pathway["job_title_score"]
                     }
                 })
-
-            # Add a demo mentor recommendation for now
+        elif career_pathways:
+            # Fallback to first pathway if no user profile
+            pathway = career_pathways[0]
             recommendations.append({
-                "type": "mentor",
-                "title": "Michael Chen",
-                "description": "Senior Tech Lead with extensive experience in cloud architecture",
-                "match_score": 88,
+                "type": "career",
+                "id": pathway["id"],
+                "title": pathway["name"],
+                "description": pathway["description"],
+                "match_score": 80,
                 "metadata": {
-                    "job_title": "Senior Tech Lead",
-                    "department": "Information Technology",
-                    "experience_years": 15,
-                    "skills": ["Cloud Architecture", "Team Leadership", "System Design"]
+                    "target_role": pathway["target_role"],
+                    "required_skills": pathway["required_skills"]
                 }
             })
 
-            return {
-                "Code": 200,
-                "Message": "Success",
-                "data": {
-                    "recommendations": recommendations
-                }
+        # Add a demo mentor recommendation for now
+        recommendations.append({
+            "type": "mentor",
+            "title": "Michael Chen",
+            "description": "Senior Tech Lead with extensive experience in cloud architecture",
+            "match_score": 88,
+            "metadata": {
+                "job_title": "Senior Tech Lead",
+                "department": "Information Technology",
+                "experience_years": 15,
+                "skills": ["Cloud Architecture", "Team Leadership", "System Design"]
             }
-        except Exception as e:
-            return {"Code": 500, "Message": f"Error generating recommendations: {str(e)}"}
+        })
 
-    def _fetch_courses(self) -> List[Dict[str, Any]]:
-        """Fetch courses from Supabase"""
+        return recommendations
+
+    def _catalog_version(self, course_snapshot: tuple, career_pathway_snapshot: tuple) -> str:
+        """
+        Content hash of the catalog snapshots the results were built from; stored recommendations
+        are only valid for the same version. Empty when a catalog could not be loaded.
+        """
+        if not (course_snapshot[2] and career_pathway_snapshot[2]):
+            return ""
+        payload = f"{course_snapshot[2]}:{career_pathway_snapshot[2]}"
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _scorer(self, table: str, snapshot: tuple, title_field: str) -> MatchScorer:
+        """MatchScorer for a catalog snapshot, built once per snapshot from its warmed rows"""
+        rows, warmed, _ = snapshot
+        built = self._scorers.get(table)
+        if built is None or built[0] is not rows:
+            built = (rows, MatchScorer(rows, title_field, warmed))
+            self._scorers[table] = built
+        return built[1]
+
+    def refresh_materialized(self) -> int:
+        """Recompute stored dashboard recommendations whose profile or catalog version changed"""
+        if not self.db.ready():
+            return 0
+        course_snapshot, career_pathway_snapshot = self._catalog_snapshots()
+        version = self._catalog_version(course_snapshot, career_pathway_snapshot)
+        if not version:
+            return 0
+        stale = self.store.stale("dashboard", self.profile_hashes, version)
+        self.store.put_many("dashboard", [
+            (user_id, self.profile_hashes[user_id], version,
+             {"recommendations": self._build_recommendations(self.user_profiles[user_id], course_snapshot,
+                                                             career_pathway_snapshot)})
+            for user_id in stale
+        ])
+        return len(stale)
+
+    def _snapshot(self, cache: TableCache, label: str) -> tuple:
+        """(rows, warmed, version) of one cached table (loaded from Supabase on first use)"""
         try:
-            response = self.db.client.table("courses").select("*").execute()
-            return response.data if response.data else []
+            return cache.snapshot()
         except Exception as e:
-            print(f"Error fetching courses: {e}")
-            return []
+            print(f"Error fetching {label}: {e}")
+            return [], [], ""
+
+    def _catalog_snapshots(self) -> tuple:
+        """(courses, career pathways) snapshots, one snapshot() call per table"""
+        return (self._snapshot(self.courses_cache, "courses"),
+                self._snapshot(self.career_pathways_cache, "career pathways"))
+
+    def _fetch_courses(self) -> List[Dict[str, Any]]:
+        """Courses from the in-process cache (loaded from Supabase on first use)"""
+        return self._snapshot(self.courses_cache, "courses")[0]
 
     def _fetch_career_pathways(self) -> List[Dict[str, Any]]:
-        """Fetch career pathways from Supabase"""
-        try:
-            response = self.db.client.table("career_pathways").select("*").execute()
-            return response.data if response.data else []
-        except Exception as e:
-            print(f"Error fetching career pathways: {e}")
-            return []
+        """Career pathways from the in-process cache (loaded from Supabase on first use)"""
+        return self._snapshot(self.career_pathways_cache, "career pathways")[0]
 
     def _get_demo_recommendations(self, user_id: str) -> Dict[str, Any]:
         """Fallback to demo data if database is not available"""
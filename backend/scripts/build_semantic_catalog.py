@@ -1,13 +1,21 @@
 import os
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from backend.shared.profile_ingestor import ProfileIngestor
 from backend.shared.catalog_builder import (
-    build_roles_from_excel, build_courses_seed, build_mentors_from_profiles, save_index
+    prepare_roles_from_excel, prepare_courses, prepare_mentors, prepare_skills, skill_lists,
+    embed_catalogs, save_index, build_lexical_index, clear_checkpoint, StageTimer, BUILD_STATS,
+    batch_stats,  # from the embeddings module the builders use, not a second copy under backend.shared
 )
+from backend.shared.index_store import load_binary_index
+from backend.shared.ann import search_index_for
+from backend.shared.skill_vectors import SkillVectorStore
 
 DATA_DIR = os.getenv("BACKEND_DATA_DIR", "backend/data")
 SRC_JSON = os.getenv("EMPLOYEE_JSON", os.path.join(DATA_DIR, "Employee_Profiles.json"))
 SRC_XLSX = os.getenv("FUNCTIONS_XLSX", os.path.join(DATA_DIR, "Functions & Skills.xlsx"))
+# also write the legacy index_*.json files next to the binary indices
+EXPORT_JSON = os.getenv("INDEX_EXPORT_JSON", "false").lower() == "true"
 
 # fallback to /mnt/data if local files don’t exist
 if not os.path.exists(SRC_JSON) and os.path.exists("/mnt/data/Employee_Profiles.json"):
@@ -15,28 +23,88 @@ if not os.path.exists(SRC_JSON) and os.path.exists("/mnt/data/Employee_Profiles.
 if not os.path.exists(SRC_XLSX) and os.path.exists("/mnt/data/Functions & Skills.xlsx"):
     SRC_XLSX = "/mnt/data/Functions & Skills.xlsx"
 
-# 1) employees -> for mentors index
-profiles = ProfileIngestor(cache_path=os.path.join(DATA_DIR, "profile_cache.json")) \
-    .ingest_profiles(SRC_JSON)
+# embedded-but-unsaved vectors survive a crash here; the next run resumes from them
+CHECKPOINT_DIR = os.path.join(DATA_DIR, ".catalog_checkpoint")
+# skills that services embedded lazily because the last build did not know them
+SKILL_EXTRAS_DIR = os.path.join(DATA_DIR, ".skill_vectors")
 
-# 2) roles -> from Excel
-roles = build_roles_from_excel(SRC_XLSX) 
-save_index(roles, os.path.join(DATA_DIR, "index_roles.json"))
+timer = StageTimer()
+prev = {name: load_binary_index(DATA_DIR, name) for name in ("roles", "courses", "mentors", "skills")}
 
-# 3) courses -> seed for now (replace with DB later)
+def _ingest_profiles():
+    with timer.stage("profiles") as st:
+        out = ProfileIngestor(cache_path=os.path.join(DATA_DIR, "profile_cache.json")).ingest_profiles(SRC_JSON)
+        st["rows"] = len(out)
+    return out
+
+def _prepare_roles():
+    with timer.stage("roles:parse") as st:
+        out = prepare_roles_from_excel(SRC_XLSX)
+        st["rows"] = len(out)
+    return out
+
+# courses -> seed for now (replace with DB later)
 seed_courses = [
     {"id": 101, "title": "Advanced Systems Design", "description": "Patterns, tradeoffs, non-functional requirements", "required_skills": ["systems design"]},
     {"id": 102, "title": "Stakeholder Management for Engineers", "description": "Influence without authority", "required_skills": ["stakeholder and partnership management"]},
     {"id": 103, "title": "Optimization in Port Operations", "description": "Routing, scheduling, constraints", "required_skills": ["optimization", "data analysis"]}
 ]
-courses = build_courses_seed(seed_courses)
-save_index(courses, os.path.join(DATA_DIR, "index_courses.json"))
 
-# 4) mentors -> from profiles
-mentors = build_mentors_from_profiles(profiles)
-save_index(mentors, os.path.join(DATA_DIR, "index_mentors.json"))
+t0 = time.perf_counter()
+with ThreadPoolExecutor(max_workers=3) as pool:
+    # 1) independent inputs in parallel: employees (for mentors), roles from Excel, seed courses
+    f_profiles = pool.submit(_ingest_profiles)
+    f_roles = pool.submit(_prepare_roles)
+    with timer.stage("courses:prepare") as st:
+        prep_courses = prepare_courses(seed_courses)
+        st["rows"] = len(prep_courses)
+    profiles = f_profiles.result()
+    with timer.stage("mentors:prepare") as st:
+        prep_mentors = prepare_mentors(profiles)
+        st["rows"] = len(prep_mentors)
+    prep_roles = f_roles.result()
+    # whole normalized skill vocabulary, so services look skill vectors up instead of embedding them
+    with timer.stage("skills:prepare") as st:
+        prep_skills = prepare_skills(*skill_lists(prep_roles, "required_skills"),
+                                     *skill_lists(prep_courses, "required_skills"),
+                                     *skill_lists(prep_mentors, "skills"),  # mentors carry every profile's skills
+                                     SkillVectorStore(extras_dir=SKILL_EXTRAS_DIR).extras())  # seen by services
+        st["rows"] = len(prep_skills)
+
+    # 2) one batched embedding pass over every changed text of all three catalogs
+    with timer.stage("embed") as st:
+        built = embed_catalogs({
+            "roles": (prep_roles, prev["roles"]),
+            "courses": (prep_courses, prev["courses"]),
+            "mentors": (prep_mentors, prev["mentors"]),
+            "skills": (prep_skills, prev["skills"]),
+        }, checkpoint_dir=CHECKPOINT_DIR)
+        st["rows"] = sum(s["embedded"] for s in BUILD_STATS.values())
+
+    # 3) write the indices in parallel
+    prepared = {"roles": prep_roles, "courses": prep_courses, "mentors": prep_mentors}
+    def _save(name):
+        with timer.stage(f"{name}:save") as st:
+            save_index(built[name], os.path.join(DATA_DIR, f"index_{name}.json"), export_json=EXPORT_JSON)
+            # prebuild the ANN index for large catalogs so services don't build it at startup
+            saved = load_binary_index(DATA_DIR, name)
+            search_index_for(saved.matrix, DATA_DIR, name, checksum=saved.info.get("checksum", ""))
+            # BM25 prefilter for hybrid retrieval over the searchable catalogs
+            if name in prepared:
+                build_lexical_index(prepared[name]).save(
+                    os.path.join(DATA_DIR, f"index_{name}.bm25.npz"), checksum=saved.info.get("checksum", ""))
+            st["rows"] = len(built[name])
+    list(pool.map(_save, built))
+    clear_checkpoint(CHECKPOINT_DIR)
 
 print("Built catalog:")
-print("  roles   :", len(roles))
-print("  courses :", len(courses))
-print("  mentors :", len(mentors))
\ No newline at end of file
+for name, rows in built.items():
+    st = BUILD_STATS.get(name, {})
+    print(f"  {name:8}: {len(rows)} (embedded {st.get('embedded', 0)}, reused {st.get('reused', 0)}, "
+          f"resumed {st.get('resumed', 0)}, removed {st.get('removed', 0)})")
+print("Stage timings:")
+print(timer.report())
+total_rows = sum(len(r) for r in built.values())
+elapsed = time.perf_counter() - t0
+print(f"  {'total':16} {elapsed:8.2f}s  {total_rows:7d} rows  {total_rows / elapsed if elapsed else 0:10.1f} rows/s")
+print("Embedding requests:", batch_stats())
@@ -0,0 +1,23 @@
+# Convert indices between the legacy JSON files and the binary (.npy + manifest) format.
+#   python -m backend.scripts.convert_indices import   # index_*.json -> binary
+#   python -m backend.scripts.convert_indices export   # binary -> index_*.json
+import os
+import sys
+from backend.shared.index_store import import_json_index, export_json_index, read_manifest
+
+DATA_DIR = os.getenv("BACKEND_DATA_DIR", "backend/data")
+NAMES = ["roles", "courses", "mentors"]
+
+mode = sys.argv[1] if len(sys.argv) > 1 else "import"
+for name in NAMES:
+    src = os.path.join(DATA_DIR, f"index_{name}.json")
+    if mode == "import":
+        if not os.path.exists(src):
+            print(f"  {name:8}: skipped (no {src})")
+            continue
+        entry = import_json_index(src, DATA_DIR, name)
+        print(f"  {name:8}: {entry['rows']} rows x {entry['dims']} dims")
+    else:
+        print(f"  {name:8}: wrote {export_json_index(DATA_DIR, name)}")
+
+print("Manifest version:", read_manifest(DATA_DIR).get("version"))
@@ -0,0 +1,65 @@
+# Recall / latency of the IVF index against exact search (the reference).
+#   python -m backend.scripts.test_ann_recall            # synthetic 50k x 256 catalog
+#   ANN_TEST_INDEX=mentors python -m backend.scripts.test_ann_recall   # a built index
+# The last section indexes 90% of the rows, extends the persisted index with the rest
+# (search_index_for's incremental insert) and compares its recall with a full build.
+import os
+import tempfile
+import time
+import numpy as np
+from backend.shared.ann import ExactIndex, IVFIndex, recall_at_k, search_index_for
+from backend.shared.embeddings import normalize_rows
+from backend.shared.index_store import load_binary_index
+
+DATA_DIR = os.getenv("BACKEND_DATA_DIR", "backend/data")
+NAME = os.getenv("ANN_TEST_INDEX")
+K = 10
+
+if NAME:
+    matrix = np.asarray(load_binary_index(DATA_DIR, NAME).matrix)
+else:
+    # clustered synthetic data, closer to real embeddings than uniform noise
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(500, 256))
+    matrix = normalize_rows(centers[rng.integers(0, 500, 50_000)] + 0.6 * rng.normal(size=(50_000, 256)))
+
+rng = np.random.default_rng(1)
+qidx = rng.choice(matrix.shape[0], min(200, matrix.shape[0]), replace=False)
+queries = matrix[qidx] \
+    + 0.05 * rng.normal(size=(min(200, matrix.shape[0]), matrix.shape[1])).astype(np.float32)
+
+exact = ExactIndex(matrix)
+t0 = time.perf_counter()
+ivf = IVFIndex.build(matrix)
+print(f"rows={matrix.shape[0]} dims={matrix.shape[1]} nlist={ivf.centroids.shape[0]} build={time.perf_counter() - t0:.2f}s")
+
+def _latency_ms(engine, **kw):
+    t0 = time.perf_counter()
+    for q in queries:
+        engine.search(q, K, **kw)
+    return 1000 * (time.perf_counter() - t0) / len(queries)
+
+print(f"  exact          recall@{K}=1.000  {_latency_ms(exact):7.3f} ms/query")
+for nprobe in (1, 4, 8, 16, 32):
+    ivf.nprobe = nprobe
+    r = recall_at_k(ivf, exact, queries, K)
+    print(f"  ivf nprobe={nprobe:<3} recall@{K}={r:.3f}  {_latency_ms(ivf):7.3f} ms/query")
+
+# incremental insert: persisted index of the first 90% of rows, extended with the rest
+base_rows = matrix.shape[0] * 9 // 10
+with tempfile.TemporaryDirectory() as tmp:
+    base = search_index_for(matrix[:base_rows], tmp, "recall", checksum="base", min_rows=1)
+    t0 = time.perf_counter()
+    grown = search_index_for(matrix, tmp, "recall", checksum="grown", min_rows=1)
+    insert_s = time.perf_counter() - t0
+    reloaded = IVFIndex.load(os.path.join(tmp, "index_recall.ivf.npz"), matrix, checksum="grown")
+extended = np.array_equal(grown.centroids, base.centroids)
+assert reloaded is not None and np.array_equal(reloaded.assign, grown.assign)
+print(f"insert {matrix.shape[0] - base_rows} rows into {base_rows}: {'extended' if extended else 'retrained'} "
+      f"in {insert_s:.2f}s, imbalance {grown.imbalance():.2f} (trained {grown.trained_imbalance:.2f})")
+inserted = queries[qidx >= base_rows]
+for nprobe in (4, 8):
+    grown.nprobe = ivf.nprobe = nprobe
+    print(f"  nprobe={nprobe:<3} recall@{K} extended={recall_at_k(grown, exact, queries, K):.3f} "
+          f"full build={recall_at_k(ivf, exact, queries, K):.3f}  "
+          f"(queries near inserted rows: {recall_at_k(grown, exact, inserted, K):.3f})")
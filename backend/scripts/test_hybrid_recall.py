@@ -0,0 +1,62 @@
+# Recall / latency of hybrid BM25-prefilter + vector fusion against the exact vector scan.
+#   python -m backend.scripts.test_hybrid_recall          # synthetic 50k-row topical catalog
+#   HYBRID_TEST_ROWS=200000 python -m backend.scripts.test_hybrid_recall
+# recall@k is agreement with the exact cosine top-k (weight=0.0 isolates what the BM25
+# shortlist loses; higher weights re-rank by lexical match on purpose); source hit@k is
+# how often the row a query was sampled from is returned, i.e. retrieval quality.
+# Caveat: vectors here come from the hashing provider, which is itself lexical (word and
+# bigram hashes), so vector and BM25 agree far more than with a semantic model and a
+# source hit@k of 1.00 does not show that real embedding rankings are preserved; rerun
+# against a catalog embedded with the production provider before tuning HYBRID_* on it.
+import os
+import time
+import numpy as np
+from backend.shared.embeddings import HashingEmbeddingProvider, VectorCatalog, normalize_rows, topk
+from backend.shared.lexical_index import BM25Index
+
+ROWS = int(os.getenv("HYBRID_TEST_ROWS", "50000"))
+K = 10
+
+rng = np.random.default_rng(0)
+words = [f"w{i}" for i in range(5000)]
+topics = [rng.choice(len(words), 30, replace=False) for _ in range(500)]
+
+def _text(topic, n_topic, n_noise):
+    picks = list(rng.choice(topics[topic], n_topic)) + list(rng.integers(0, len(words), n_noise))
+    return " ".join(words[i] for i in picks)
+
+texts = [_text(int(rng.integers(0, 500)), 12, 3) for _ in range(ROWS)]
+# queries: a handful of words taken from one catalog row (a profile/role "describing" it)
+sources = rng.integers(0, ROWS, 200)
+queries = [" ".join(rng.choice(texts[int(i)].split(), 6, replace=False)) for i in sources]
+
+provider = HashingEmbeddingProvider(1024)
+t0 = time.perf_counter()
+cat = VectorCatalog([{"id": i} for i in range(ROWS)], normalize_rows(provider.embed_batch(texts)))
+qvecs = normalize_rows(provider.embed_batch(queries))
+embed_s = time.perf_counter() - t0
+t0 = time.perf_counter()
+lexical = BM25Index.build(texts)
+print(f"rows={ROWS} embed={embed_s:.2f}s bm25 build={time.perf_counter() - t0:.2f}s terms={len(lexical.terms)}")
+
+exact = [topk(q, cat.matrix, K)[0] for q in qvecs]
+
+def _run(search):
+    """(recall@K vs exact vector, source-row hit rate@K, ms/query)"""
+    hits, found, t0 = 0, 0, time.perf_counter()
+    for q, text, ref, src in zip(qvecs, queries, exact, sources):
+        idx = search(q, text)
+        hits += len(set(idx.tolist()) & set(ref.tolist()))
+        found += int(src in idx)
+    return hits / float(K * len(queries)), found / float(len(queries)), 1000 * (time.perf_counter() - t0) / len(queries)
+
+def _report(label, search):
+    r, hit, ms = _run(search)
+    print(f"  {label:26} recall@{K}={r:.3f}  source hit@{K}={hit:.3f}  {ms:7.3f} ms/query")
+
+_report("exact vector", lambda q, text: topk(q, cat.matrix, K)[0])
+for pool in (50, 200, 1000):
+    for weight in (0.0, 0.3, 0.6):
+        _report(f"hybrid pool={pool} w={weight:.1f}",
+                lambda q, text: (lexical.hybrid_search(cat, q, text, K, pool=pool, weight=weight, min_rows=1)
+                                 or topk(q, cat.matrix, K))[0])
@@ -0,0 +1,34 @@
+# A rebuild with no data changes must not touch the indices: same checksums, same
+# manifest version (otherwise services hot-reload and every stored plan is invalidated).
+#   python -m backend.scripts.test_noop_rebuild     # runs the offline build on a copy of backend/data
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+SRC_DIR = os.getenv("BACKEND_DATA_DIR", "backend/data")
+
+def _manifest(data_dir):
+    with open(os.path.join(data_dir, "index_manifest.json")) as f:
+        m = json.load(f)
+    return m.get("version"), {name: e.get("checksum") for name, e in m.get("indices", {}).items()}
+
+def _build(data_dir):
+    env = {**os.environ, "BACKEND_DATA_DIR": data_dir, "EMBED_PROVIDER": "local"}
+    subprocess.run([sys.executable, "-m", "backend.scripts.build_semantic_catalog"],
+                   env=env, check=True, stdout=subprocess.DEVNULL)
+
+with tempfile.TemporaryDirectory() as tmp:
+    data_dir = os.path.join(tmp, "data")
+    shutil.copytree(SRC_DIR, data_dir)
+    _build(data_dir)  # brings the copy up to date with the current code/provider
+    first = _manifest(data_dir)
+    for _ in range(2):
+        _build(data_dir)
+        again = _manifest(data_dir)
+        print("manifest version:", first[0], "->", again[0])
+        assert again == first, f"no-op rebuild changed the indices: {first} -> {again}"
+
+print("✅ No-op rebuild left checksums and manifest version unchanged")
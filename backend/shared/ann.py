@@ -0,0 +1,218 @@
+# backend/shared/ann.py
+"""
+Nearest-neighbour search over pre-normalized float32 catalog matrices.
+
+Both engines expose the same interface:
+    search(query, k) -> (row indices, cosine scores), best first
+
+Engines index their catalog's matrix in place, so returned positions are always
+catalog row positions. Inserts go through the catalog: IVFIndex.extend(matrix) takes
+the grown matrix and only assigns the appended rows, and search_index_for() does so
+for a persisted index whose rows are an unchanged prefix of the new matrix.
+
+- ExactIndex: full matrix-vector scan; the reference for recall measurements.
+- IVFIndex: inverted file over spherical k-means centroids. A query scores the
+  `nprobe` nearest centroids, then only the rows in those lists. `nlist` and
+  `nprobe` trade recall for latency.
+"""
+import hashlib, io, os, sys
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+# Add the current directory to the path so we can import from shared modules
+sys.path.append(os.path.dirname(__file__))
+
+from embeddings import as_unit, normalize_rows, topk
+from checkpoint import atomic_write_bytes
+
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "20000"))  # below this, exact search is fast enough
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+# retrain instead of extending once the largest list outgrows the trained balance by this factor
+ANN_REBALANCE_GROWTH = float(os.getenv("ANN_REBALANCE_GROWTH", "1.5"))
+
+
+class ExactIndex:
+    kind = "exact"
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+
+    def search(self, query, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return topk(query, self.matrix, k)
+
+
+def _spherical_kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0,
+                      sample: int = 100_000) -> np.ndarray:
+    """k unit centroids fitted on (a sample of) the unit rows of x."""
+    rng = np.random.default_rng(seed)
+    if x.shape[0] > sample:
+        x = x[np.sort(rng.choice(x.shape[0], sample, replace=False))]
+    x = np.ascontiguousarray(x, dtype=np.float32)
+    centroids = x[rng.choice(x.shape[0], k, replace=False)].copy()
+    for _ in range(iters):
+        assign = _nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        # per-cluster sums via one sort + reduceat (much faster than np.add.at)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(x[order], starts[nonempty], axis=0)
+        empty = counts == 0
+        if empty.any():  # reseed empty clusters from random points
+            sums[empty] = x[rng.choice(x.shape[0], int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+def _nearest(x: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    out = np.empty(x.shape[0], dtype=np.int32)
+    for i in range(0, x.shape[0], chunk):
+        out[i:i+chunk] = np.argmax(np.asarray(x[i:i+chunk], dtype=np.float32) @ centroids.T, axis=1)
+    return out
+
+
+def _rows_hash(matrix: np.ndarray, start: int = 0, stop: Optional[int] = None, h=None, chunk: int = 65536):
+    """sha256 over the raw float32 bytes of rows start:stop, continuing `h` if given."""
+    h = h or hashlib.sha256()
+    stop = matrix.shape[0] if stop is None else stop
+    for i in range(start, stop, chunk):
+        h.update(np.ascontiguousarray(matrix[i:min(i + chunk, stop)], dtype=np.float32).tobytes())
+    return h
+
+
+class IVFIndex:
+    kind = "ivf"
+
+    def __init__(self, matrix: np.ndarray, centroids: np.ndarray, assign: np.ndarray, nprobe: int = ANN_NPROBE,
+                 trained_imbalance: Optional[float] = None):
+        self.matrix = matrix
+        self.centroids = centroids
+        self.assign = assign
+        self.nprobe = nprobe
+        self._build_lists()
+        self.trained_imbalance = trained_imbalance or self.imbalance()
+        self.rows_digest: Optional[str] = None  # _rows_hash of `matrix`, computed on save if unknown
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, nlist: Optional[int] = None, nprobe: int = ANN_NPROBE,
+              iters: int = 10, seed: int = 0) -> "IVFIndex":
+        n = matrix.shape[0]
+        nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        centroids = _spherical_kmeans(matrix, nlist, iters=iters, seed=seed)
+        return cls(matrix, centroids, _nearest(matrix, centroids), nprobe=nprobe)
+
+    def _build_lists(self):
+        # CSR layout: rows grouped by list, offsets[l]:offsets[l+1] are list l's rows
+        self.order = np.argsort(self.assign, kind="stable").astype(np.int64)
+        counts = np.bincount(self.assign, minlength=self.centroids.shape[0])
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def imbalance(self) -> float:
+        """Largest list over the mean list size (1.0 = perfectly even)."""
+        counts = np.diff(self.offsets)
+        return float(counts.max() * len(counts) / max(1, counts.sum())) if len(counts) else 1.0
+
+    def extend(self, matrix: np.ndarray):
+        """
+        Incremental insert: `matrix` is the catalog's grown matrix whose first rows are the
+        ones already indexed; only the appended rows are assigned to their nearest list
+        (centroids unchanged), so positions stay catalog row positions.
+        """
+        n = self.assign.shape[0]
+        if matrix.shape[0] < n:
+            raise ValueError(f"extend() needs the grown matrix ({matrix.shape[0]} rows < {n} indexed)")
+        self.assign = np.concatenate([self.assign, _nearest(matrix[n:], self.centroids)]).astype(np.int32)
+        self.matrix = matrix
+        self._build_lists()
+        self.rows_digest = None
+
+    def search(self, query, k: int, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        q = as_unit(query)
+        probes, _ = topk(q, self.centroids, nprobe or self.nprobe)
+        cand = np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in probes]) \
+            if len(probes) else np.empty(0, dtype=np.int64)
+        if cand.size == 0:
+            return cand, np.empty(0, dtype=np.float32)
+        cand.sort()  # sequential reads from the (memory-mapped) matrix
+        local, scores = topk(q, self.matrix[cand], k)
+        return cand[local], scores
+
+    # --- persistence (next to the index files; matrix itself is not duplicated) ---
+    def save(self, path: Union[str, Path], checksum: str = ""):
+        if self.rows_digest is None:
+            self.rows_digest = _rows_hash(self.matrix).hexdigest()
+        buf = io.BytesIO()
+        np.savez(buf, centroids=self.centroids, assign=self.assign,
+                 nprobe=np.int32(self.nprobe), rows=np.int64(self.matrix.shape[0]), checksum=np.str_(checksum),
+                 rows_digest=np.str_(self.rows_digest), trained_imbalance=np.float64(self.trained_imbalance))
+        atomic_write_bytes(path, buf.getvalue())
+
+    @classmethod
+    def load(cls, path: Union[str, Path], matrix: np.ndarray, checksum: str = "") -> Optional["IVFIndex"]:
+        """Returns None when the file is missing or was built for a different matrix."""
+        if not Path(path).exists():
+            return None
+        with np.load(path) as z:
+            if int(z["rows"]) != matrix.shape[0] or (checksum and str(z["checksum"]) != checksum):
+                return None
+            ivf = cls(matrix, z["centroids"], z["assign"], nprobe=int(z["nprobe"]),
+                      trained_imbalance=float(z["trained_imbalance"]) if "trained_imbalance" in z.files else None)
+            ivf.rows_digest = str(z["rows_digest"]) if "rows_digest" in z.files else None
+            return ivf
+
+    @classmethod
+    def load_extended(cls, path: Union[str, Path], matrix: np.ndarray,
+                      growth: float = ANN_REBALANCE_GROWTH) -> Optional["IVFIndex"]:
+        """
+        The persisted index of an earlier, shorter version of `matrix`, extended with the
+        appended rows. None (retrain) when the file is missing or predates row digests, when
+        indexed rows were changed, deleted or reordered, or when the lists got more than
+        `growth` times as unbalanced as they were when trained.
+        """
+        if not Path(path).exists():
+            return None
+        with np.load(path) as z:
+            if "rows_digest" not in z.files:
+                return None
+            rows = int(z["rows"])
+            if rows >= matrix.shape[0] or z["centroids"].shape[1] != matrix.shape[1]:
+                return None
+            h = _rows_hash(matrix, 0, rows)
+            if h.hexdigest() != str(z["rows_digest"]):
+                return None
+            ivf = cls(matrix[:rows], z["centroids"], z["assign"], nprobe=int(z["nprobe"]),
+                      trained_imbalance=float(z["trained_imbalance"]))
+        ivf.extend(matrix)
+        if ivf.imbalance() > ivf.trained_imbalance * growth:
+            return None
+        ivf.rows_digest = _rows_hash(matrix, rows, h=h).hexdigest()  # prefix already hashed above
+        return ivf
+
+
+def search_index_for(matrix: np.ndarray, data_dir: Optional[Union[str, Path]] = None, name: str = "",
+                     checksum: str = "", min_rows: int = ANN_MIN_ROWS):
+    """
+    Exact search for small catalogs; otherwise load the persisted IVF index for this
+    matrix (index_<name>.ivf.npz). A catalog that only gained rows since then extends the
+    persisted index with them; anything else trains a new one. Either is persisted.
+    """
+    if matrix.shape[0] < max(1, min_rows):
+        return ExactIndex(matrix)
+    path = Path(data_dir) / f"index_{name}.ivf.npz" if data_dir and name else None
+    ivf = IVFIndex.load(path, matrix, checksum) if path else None
+    if ivf is None:
+        ivf = (IVFIndex.load_extended(path, matrix) if path else None) or IVFIndex.build(matrix)
+        if path:
+            ivf.save(path, checksum)
+    return ivf
+
+def recall_at_k(approx, exact, queries: np.ndarray, k: int = 10) -> float:
+    """Mean fraction of the exact top-k that the approximate engine also returns."""
+    hits = 0
+    for q in queries:
+        a, _ = approx.search(q, k)
+        e, _ = exact.search(q, k)
+        hits += len(set(a.tolist()) & set(e.tolist()))
+    return hits / float(k * len(queries)) if len(queries) else 1.0
@@ -1,19 +1,172 @@
-from typing import List, Dict, Optional
-import json, os
+from typing import List, Dict, Optional, Tuple
+from contextlib import contextmanager
+import hashlib, json, os, time
 import sys
 import pandas as pd
 
 # Add the current directory to the path so we can import from shared modules
 sys.path.append(os.path.dirname(__file__))
 
-from embeddings import embed_text
-from skill_normalizer import normalize_list, normalize_skill
+from embeddings import embed_many, get_provider, batch_stats  # re-exported: the counters live in this module object
+from skill_normalizer import normalize_lists
+from index_store import save_binary_index
+from checkpoint import SegmentCheckpoint, CHECKPOINT_EVERY
+from mentor_search import job_level
+from lexical_index import BM25Index
 
-def _embed_field_join(parts: List[str]) -> list[float]:
-    text = " | ".join([p for p in parts if p])
-    return embed_text(text)
+# per-catalog counters from the last build: {"roles": {"embedded": n, "reused": m, "removed": k}, ...}
+BUILD_STATS: Dict[str, Dict[str, int]] = {}
 
-def build_roles_from_excel(xlsx_path: str, sheet: Optional[str] = None) -> List[Dict]:
+# (row, embedding text) pairs produced by the prepare_* functions
+Prepared = List[Tuple[Dict, str]]
+
+def _field_text(parts: List[str]) -> str:
+    return " | ".join([p for p in parts if p])
+
+def _content_hash(text: str) -> str:
+    # provider name is part of the hash so switching embedding backends re-embeds everything
+    return hashlib.sha1(f"{get_provider().name}\n{text}".encode("utf-8")).hexdigest()
+
+def _previous_vectors(previous) -> Dict[str, list]:
+    """content_hash -> vector from a previous build (VectorCatalog or rows with 'vector')."""
+    if not previous:
+        return {}
+    if getattr(previous, "matrix", None) is not None:
+        return {r["content_hash"]: vec.tolist() for r, vec in zip(previous, previous.matrix) if r.get("content_hash")}
+    return {r["content_hash"]: r["vector"] for r in previous if r.get("content_hash") and r.get("vector")}
+
+def embed_catalogs(jobs: Dict[str, Tuple[Prepared, object]], batch_size: int = 256,
+                   checkpoint_dir: Optional[str] = None,
+                   checkpoint_every: int = CHECKPOINT_EVERY) -> Dict[str, List[Dict]]:
+    """
+    Attach vectors to prepared rows of several catalogs at once.
+    jobs: {name: (prepared rows, previous index or None)}.
+    Rows whose text is unchanged since `previous` reuse its vector; every other text,
+    across all catalogs, is deduplicated and embedded through embed_many.
+    With checkpoint_dir, new vectors are made durable every `checkpoint_every` texts,
+    and a re-run after a crash resumes from them instead of re-embedding.
+    """
+    ckpt = SegmentCheckpoint(checkpoint_dir) if checkpoint_dir else None
+    fresh = ckpt.load() if ckpt else {}
+
+    plans, pending = {}, {}
+    for name, (prepared, previous) in jobs.items():
+        reuse = _previous_vectors(previous)
+        stats = BUILD_STATS[name] = {"embedded": 0, "reused": 0, "resumed": 0}
+        for row, text in prepared:
+            row["content_hash"] = _content_hash(text)
+            if row["content_hash"] in reuse:
+                stats["reused"] += 1
+            elif row["content_hash"] in fresh:
+                stats["resumed"] += 1
+            else:
+                stats["embedded"] += 1
+                pending.setdefault(row["content_hash"], text)
+        stats["removed"] = len(set(reuse) - {row["content_hash"] for row, _ in prepared})
+        plans[name] = (prepared, reuse)
+
+    hashes = list(pending)
+    step = max(1, checkpoint_every) if ckpt else max(1, len(hashes))
+    for i in range(0, len(hashes), step):
+        part = hashes[i:i+step]
+        got = dict(zip(part, embed_many([pending[h] for h in part], batch_size=batch_size)))
+        if ckpt:
+            ckpt.append(got)
+        fresh.update(got)
+
+    out = {}
+    for name, (prepared, reuse) in plans.items():
+        for row, _ in prepared:
+            h = row["content_hash"]
+            row["vector"] = reuse[h] if h in reuse else fresh[h]
+        out[name] = [row for row, _ in prepared]
+    return out
+
+def clear_checkpoint(checkpoint_dir: str):
+    """Drop a build checkpoint once its indices have been saved."""
+    SegmentCheckpoint(checkpoint_dir).clear()
+
+# bump when the parsed layout below changes, so old taxonomy caches are ignored
+_TAXONOMY_CACHE_VERSION = 1
+
+def _file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _cell(values: tuple, j: Optional[int]):
+    return values[j] if j is not None and j < len(values) and values[j] is not None else ""
+
+def _stream_taxonomy(xlsx_path: str, sheet: Optional[str] = None) -> pd.DataFrame:
+    """
+    Stream the workbook with openpyxl's read-only row iterator. Columns are resolved
+    once from the header; each row contributes (row_id, role, description, skills_raw)
+    where skills_raw joins every skill cell with ','.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = [str(h).strip() if h is not None else f"Unnamed: {j}" for j, h in enumerate(next(rows, ()))]
+        cols = {c.lower(): j for j, c in enumerate(header)}
+
+        # heuristics for column names
+        role_j = cols.get("role", cols.get("function", cols.get("job title", 0)))
+        desc_j = cols.get("description")
+        req_j  = cols.get("required skills", cols.get("skills"))
+        # without a dedicated column, gather skills from any column that contains 'skill'
+        skill_js = [req_j] if req_j is not None else [j for j, c in enumerate(header) if "skill" in c.lower()]
+
+        out = {"row_id": [], "role": [], "description": [], "skills_raw": []}
+        for i, values in enumerate(rows):
+            role = str(_cell(values, role_j)).strip()
+            if not role:
+                continue
+            out["row_id"].append(i + 1)  # simple stable id by row index; replace with real id if you have one
+            out["role"].append(role)
+            out["description"].append(str(_cell(values, desc_j)).strip())
+            out["skills_raw"].append(",".join(str(_cell(values, j)) for j in skill_js if _cell(values, j) != ""))
+    finally:
+        wb.close()
+    return pd.DataFrame(out)
+
+def load_taxonomy(xlsx_path: str, sheet: Optional[str] = None, cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Parsed taxonomy as a DataFrame (row_id, role, description, skills: list[str], raw,
+    not yet normalized). Cached as Parquet keyed by workbook hash + sheet, so repeated
+    builds of an unchanged workbook skip Excel parsing entirely.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(xlsx_path)), ".taxonomy_cache")
+    key = hashlib.sha1(f"{_file_sha256(xlsx_path)}|{sheet or ''}|{_TAXONOMY_CACHE_VERSION}".encode()).hexdigest()
+    cache_path = os.path.join(cache_dir, f"taxonomy_{key}.parquet")
+    if os.path.exists(cache_path):
+        try:
+            return pd.read_parquet(cache_path)
+        except ImportError:
+            pass  # no parquet engine installed; fall through to parsing
+
+    df = _stream_taxonomy(xlsx_path, sheet)
+    # vectorized split of the joined skill cells; strip/drop empties per list
+    raw = df.pop("skills_raw").astype(str)
+    df["skills"] = [
+        [x.strip() for x in parts if x.strip()]
+        for parts in raw.str.replace(";", ",", regex=False).str.split(",")
+    ]
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = cache_path + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, cache_path)
+    except ImportError:
+        print("[WARN] pyarrow not installed; taxonomy cache disabled")
+    return df
+
+def prepare_roles_from_excel(xlsx_path: str, sheet: Optional[str] = None) -> Prepared:
     """
     Expect columns similar to:
     - 'Role' or 'Function' or 'Job Title'
@@ -21,81 +174,114 @@ def build_roles_from_excel(xlsx_path: str, sheet: Optional[str] = None) -> List[
     - 'Required Skills' (comma/semicolon separated) OR separate columns for skills
     We keep it defensive so slight column name variations don't break us.
     """
-    df = pd.read_excel(xlsx_path, sheet_name=sheet) if sheet else pd.read_excel(xlsx_path)
-    cols = {c.lower(): c for c in df.columns}
-
-    # heuristics for column names
-    role_col = cols.get("role") or cols.get("function") or cols.get("job title") or list(df.columns)[0]
-    desc_col = cols.get("description") or None
-    req_col  = cols.get("required skills") or cols.get("skills") or None
-
+    df = load_taxonomy(xlsx_path, sheet)
     roles = []
-    for i, row in df.iterrows():
-        role = str(row.get(role_col, "")).strip()
-        if not role:
-            continue
-        desc = str(row.get(desc_col, "")).strip() if desc_col else ""
-        if req_col:
-            raw = row.get(req_col, "")
-            if pd.isna(raw): raw = ""
-            req_sk = [s.strip() for s in str(raw).replace(";", ",").split(",") if s.strip()]
-        else:
-            # try to gather skills from any column that contains 'skill'
-            req_sk = []
-            for c in df.columns:
-                if "skill" in c.lower():
-                    val = row.get(c, "")
-                    if pd.isna(val): continue
-                    req_sk.extend([s.strip() for s in str(val).replace(";", ",").split(",") if s.strip()])
-
-        req_sk = normalize_list(req_sk)
-        vec = _embed_field_join([role, desc, "required: " + ", ".join(req_sk)])
-        roles.append({
-            "id": i + 1,  # simple stable id by row index; replace with real id if you have one
+    # one bulk normalization pass over the whole skills column
+    for row_id, role, desc, req_sk in zip(df["row_id"], df["role"], df["description"], normalize_lists(df["skills"])):
+        roles.append(({
+            "id": int(row_id),
             "role": role,
             "description": desc,
             "required_skills": req_sk,
-            "vector": vec
-        })
+        }, _field_text([role, desc, "required: " + ", ".join(req_sk)])))
     return roles
 
-def build_courses_seed(courses: List[Dict]) -> List[Dict]:
+def build_roles_from_excel(xlsx_path: str, sheet: Optional[str] = None, previous=None) -> List[Dict]:
+    """previous: the last built roles index; rows whose embedding text is unchanged reuse its vectors."""
+    return embed_catalogs({"roles": (prepare_roles_from_excel(xlsx_path, sheet), previous)})["roles"]
+
+def prepare_courses(courses: List[Dict]) -> Prepared:
     """
     courses: [{id,title,description,required_skills:[...]}]
     """
     out = []
-    for c in courses:
-        req = normalize_list(c.get("required_skills", []))
-        vec = _embed_field_join([c.get("title",""), c.get("description",""), "skills: " + ", ".join(req)])
-        out.append({**c, "required_skills": req, "vector": vec})
+    for c, req in zip(courses, normalize_lists([c.get("required_skills", []) for c in courses])):
+        out.append(({**c, "required_skills": req},
+                    _field_text([c.get("title",""), c.get("description",""), "skills: " + ", ".join(req)])))
     return out
 
-def build_mentors_from_profiles(profiles: List[Dict]) -> List[Dict]:
+def build_courses_seed(courses: List[Dict], previous=None) -> List[Dict]:
+    """previous: the last built courses index (unchanged rows reuse its vectors)"""
+    return embed_catalogs({"courses": (prepare_courses(courses), previous)})["courses"]
+
+def prepare_mentors(profiles: List[Dict]) -> Prepared:
     """
     profiles: output from your ProfileIngestor/loader (already normalized/embedded employees).
     We'll *re-embed* mentors with a text more focused on mentorship.
     """
     out = []
-    for p in profiles:
-        skills = normalize_list(p.get("skills", []))
+    for p, skills in zip(profiles, normalize_lists([p.get("skills", []) for p in profiles])):
         blob_parts = [
             p.get("name",""),
             p.get("job_title",""),
             "skills: " + ", ".join(skills),
             # if you later add 'bio' or 'achievements', include them here
         ]
-        vec = _embed_field_join(blob_parts)
-        out.append({
+        out.append(({
             "id": p["employee_id"],
             "name": p["name"],
             "job_title": p["job_title"],
+            "department": p.get("department", ""),
+            "job_level": job_level(p.get("job_title", "")),
+            "available": bool(p.get("available", True)),  # profiles may opt out of mentoring
             "skills": skills,
             "bio": "",  # fill later if you have one
-            "vector": vec
-        })
+        }, _field_text(blob_parts)))
     return out
 
-def save_index(data: List[Dict], path: str):
+def build_mentors_from_profiles(profiles: List[Dict], previous=None) -> List[Dict]:
+    """previous: the last built mentors index (unchanged rows reuse its vectors)"""
+    return embed_catalogs({"mentors": (prepare_mentors(profiles), previous)})["mentors"]
+
+def prepare_skills(*skill_lists) -> Prepared:
+    """
+    The normalized skill vocabulary as a catalog: one row per distinct skill from any
+    number of skill lists (role / course required_skills, profile skills), embedded as-is.
+    """
+    vocab = sorted({sk for skills in normalize_lists(skill_lists) for sk in skills})
+    return [({"id": sk, "skill": sk}, sk) for sk in vocab]
+
+def skill_lists(prepared: Prepared, field: str) -> List[List[str]]:
+    """The `field` skill list of every prepared row (input for prepare_skills)."""
+    return [row.get(field, []) for row, _ in prepared]
+
+def build_lexical_index(prepared: Prepared) -> BM25Index:
+    """BM25 index over the same text each row was embedded from (row order preserved)."""
+    return BM25Index.build([text for _, text in prepared])
+
+def save_index(data: List[Dict], path: str, export_json: bool = False):
+    """
+    Persist an index in the binary format (float32 .npy + metadata sidecar + manifest,
+    see index_store). `path` keeps its historical .../index_<name>.json form;
+    export_json=True also writes that legacy JSON file.
+    """
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
\ No newline at end of file
+    name = os.path.splitext(os.path.basename(path))[0].replace("index_", "", 1)
+    save_binary_index(data, os.path.dirname(path), name)
+    if export_json:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+
+class StageTimer:
+    """Collects wall-clock time and row throughput per pipeline stage (thread-safe appends)."""
+
+    def __init__(self):
+        self.stages: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        rec = {"stage": name, "rows": 0}
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["seconds"] = time.perf_counter() - t0
+            self.stages.append(rec)
+
+    def report(self) -> str:
+        lines = []
+        for r in self.stages:
+            rate = r["rows"] / r["seconds"] if r["seconds"] > 0 else 0.0
+            lines.append(f"  {r['stage']:16} {r['seconds']:8.2f}s  {r['rows']:7d} rows  {rate:10.1f} rows/s")
+        return "\n".join(lines)
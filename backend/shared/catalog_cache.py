@@ -0,0 +1,128 @@
+# backend/shared/catalog_cache.py
+"""
+In-process cache of a small Supabase catalog table (courses, career pathways).
+
+The first get() loads the whole table; after that a background Refresher polls
+every `ttl` seconds for what changed since the last watermark: the id column
+(new and deleted rows) plus rows with updated_at >= the newest updated_at seen.
+Only rows whose content actually changed are re-warmed (`warm(row)`, e.g.
+normalized skill bitsets and title tokens) and re-hashed, so requests read a
+ready snapshot and never touch the database in steady state.
+Tables without an updated_at column fall back to a full fetch per refresh, still
+re-warming only the rows that differ.
+"""
+import hashlib, json, os, sys, threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Add the current directory to the path so we can import from shared modules
+sys.path.append(os.path.dirname(__file__))
+
+from plan_store import Refresher
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "60"))  # <= 0: refresh on every get()
+
+def _row_digest(row: Dict) -> str:
+    return hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class TableCache:
+    """Snapshot of one table: rows, per-row warmed data and a content version, all aligned."""
+
+    def __init__(self, client: Callable[[], Any], table: str, warm: Optional[Callable[[Dict], Any]] = None,
+                 ttl: float = CATALOG_CACHE_TTL, key: str = "id", updated_field: str = "updated_at"):
+        self._client = client          # returns the Supabase client (or None when offline)
+        self.table = table
+        self._warm = warm or (lambda row: None)
+        self.ttl = ttl
+        self.key = key
+        self.updated_field = updated_field
+        self._lock = threading.Lock()
+        # id -> (row, digest, warmed), in table order; replaced wholesale by refreshes
+        self._entries: Dict[Any, Tuple[Dict, str, Any]] = {}
+        self._snapshot: Tuple[List[Dict], List[Any], str] = ([], [], "")
+        self.loaded = False
+        self.watermark: Optional[str] = None
+        self.incremental = True
+        self.last_refresh: Optional[str] = None
+        self.last_changed = 0
+        self.refreshes = 0
+        # first load happens inline in snapshot(); the thread only polls for changes afterwards
+        self._refresher = Refresher(self.refresh, ttl, name=f"{table}-cache", wait_first=True)
+
+    # --- reads ---
+    def get(self) -> List[Dict]:
+        return self.snapshot()[0]
+
+    def snapshot(self) -> Tuple[List[Dict], List[Any], str]:
+        """(rows, warmed values aligned with rows, content version); loads on first use."""
+        if not self.loaded or self.ttl <= 0:
+            self.refresh()
+            self._refresher.start()
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        """Content version of the current snapshot (changes whenever any row does)."""
+        if not self.loaded:
+            self.snapshot()
+        return self._snapshot[2]
+
+    # --- refresh ---
+    def _query(self):
+        return self._client().table(self.table)
+
+    def _full(self) -> List[Dict]:
+        return self._query().select("*").execute().data or []
+
+    def _changed(self) -> Optional[Tuple[List[Dict], set]]:
+        """(rows changed since the watermark, current ids), or None when a full fetch is needed."""
+        if not self.incremental or self.watermark is None:
+            return None
+        ids = {r[self.key] for r in (self._query().select(self.key).execute().data or [])}
+        changed = self._query().select("*").gte(self.updated_field, self.watermark).execute().data or []
+        new = ids - set(self._entries) - {r[self.key] for r in changed}
+        if new:  # inserted with an old updated_at (e.g. restored rows)
+            changed += self._query().select("*").in_(self.key, sorted(new)).execute().data or []
+        return changed, ids
+
+    def refresh(self) -> int:
+        """Apply table changes to the snapshot; returns how many rows were added, changed or removed."""
+        with self._lock:
+            delta = self._changed()
+            if delta is None:
+                rows = self._full()
+                ids = {r[self.key] for r in rows}
+                if rows and self.incremental and self.updated_field not in rows[0]:
+                    print(f"[WARN] {self.table} has no {self.updated_field} column; catalog cache refreshes are full fetches")
+                    self.incremental = False
+            else:
+                rows, ids = delta
+            entries = {k: v for k, v in self._entries.items() if k in ids}
+            changed = len(self._entries) - len(entries)
+            for row in rows:
+                digest = _row_digest(row)
+                old = entries.get(row[self.key])
+                if old is not None and old[1] == digest:
+                    continue
+                entries[row[self.key]] = (row, digest, self._warm(row))
+                changed += 1
+            if self.incremental:
+                stamps = [str(e[0][self.updated_field]) for e in entries.values() if e[0].get(self.updated_field)]
+                self.watermark = max(stamps) if stamps else self.watermark
+            if changed or not self.loaded:
+                self._entries = entries
+                values = list(entries.values())
+                version = hashlib.sha1("".join(d for _, d, _ in values).encode("utf-8")).hexdigest()[:16]
+                self._snapshot = ([r for r, _, _ in values], [w for _, _, w in values], version)
+            self.loaded = True
+            self.refreshes += 1
+            self.last_changed = changed
+            self.last_refresh = datetime.now().isoformat()
+            return changed
+
+    def status(self) -> Dict:
+        return {"table": self.table, "rows": len(self._snapshot[0]), "version": self._snapshot[2],
+                "watermark": self.watermark, "incremental": self.incremental, "refreshes": self.refreshes,
+                "last_refresh": self.last_refresh, "last_changed": self.last_changed,
+                "refresher": self._refresher.status()}
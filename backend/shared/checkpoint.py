@@ -0,0 +1,99 @@
+# backend/shared/checkpoint.py
+import io, json, os, time, uuid
+from pathlib import Path
+from typing import Dict, List, Union
+
+import numpy as np
+
+# how many embedded items a build may lose on a crash (catalog + profile builds)
+CHECKPOINT_EVERY = int(os.getenv("BUILD_CHECKPOINT_EVERY", "500"))
+# segment count above which a SegmentCheckpoint merges its segments (<= 0: never)
+CHECKPOINT_COMPACT_SEGMENTS = int(os.getenv("CHECKPOINT_COMPACT_SEGMENTS", "64"))
+
+def atomic_write_bytes(path: Union[str, Path], payload: bytes):
+    """Write to a temp file, fsync, then rename over `path` (readers never see a partial file)."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def atomic_write_json(path: Union[str, Path], obj, **kwargs):
+    atomic_write_bytes(path, json.dumps(obj, **kwargs).encode("utf-8"))
+
+
+class SegmentCheckpoint:
+    """
+    Durable content_hash -> vector store for an in-progress build (also the skill
+    side store, shared by every worker process).
+    Every append() writes one new .npz segment atomically under a unique name, so
+    concurrent writers never overwrite each other and checkpointing stays O(items)
+    instead of rewriting everything embedded so far. Once more than
+    `compact_after` segments pile up, append() merges them into one. clear() after success.
+    """
+
+    def __init__(self, directory: Union[str, Path], compact_after: int = CHECKPOINT_COMPACT_SEGMENTS):
+        self.dir = Path(directory)
+        self.compact_after = compact_after
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.dir.glob("segment_*.npz")) if self.dir.exists() else []
+
+    @staticmethod
+    def _read(seg: Path) -> Dict[str, list]:
+        # a segment may vanish under us when another process compacts or clears the store
+        try:
+            with np.load(seg) as z:
+                return {str(h): vec.tolist() for h, vec in zip(z["hashes"], z["vectors"])}
+        except FileNotFoundError:
+            return {}
+
+    def load(self) -> Dict[str, list]:
+        out: Dict[str, list] = {}
+        for seg in self._segments():
+            out.update(self._read(seg))
+        return out
+
+    def _write(self, items: Dict[str, list]):
+        # time-ordered, and unique across processes and threads (no shared sequence number to race on)
+        name = f"segment_{time.time_ns():020d}_{os.getpid()}_{uuid.uuid4().hex[:8]}.npz"
+        buf = io.BytesIO()
+        np.savez(buf, hashes=np.array(list(items), dtype=str),
+                 vectors=np.asarray(list(items.values()), dtype=np.float32))
+        atomic_write_bytes(self.dir / name, buf.getvalue())
+
+    def append(self, items: Dict[str, list]):
+        if not items:
+            return
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._write(items)
+        if self.compact_after > 0 and len(self._segments()) > self.compact_after:
+            self.compact()
+
+    def compact(self):
+        """
+        Merge the current segments into one. Writes the merged segment before removing
+        its sources, so a crash or a concurrent compaction can only leave duplicates
+        (harmless: later segments win in load()), never lose vectors.
+        """
+        segs = self._segments()
+        if len(segs) < 2:
+            return
+        merged: Dict[str, list] = {}
+        for seg in segs:
+            merged.update(self._read(seg))
+        if merged:
+            self._write(merged)
+        for seg in segs:
+            seg.unlink(missing_ok=True)
+
+    def clear(self):
+        for seg in self._segments():
+            seg.unlink(missing_ok=True)
+        try:
+            if self.dir.exists() and not any(self.dir.iterdir()):
+                self.dir.rmdir()
+        except OSError:  # another process wrote a segment meanwhile
+            pass
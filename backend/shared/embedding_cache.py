@@ -0,0 +1,110 @@
+# backend/shared/embedding_cache.py
+import hashlib, os, sqlite3, threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different strings share one embedding."""
+    return " ".join((text or "").split())
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: an in-process LRU in front of a SQLite store.
+    Entries are keyed by (deployment, sha256 of normalized text), so vectors from
+    one embedding deployment are never served for another.
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 4096):
+        self.path = path
+        self.capacity = capacity
+        self._lru: "OrderedDict[tuple, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    # --- disk tier ---
+    def _conn(self):
+        if self._db is None and self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, key TEXT NOT NULL, dims INTEGER NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, key))"
+            )
+            self._db.commit()
+        return self._db
+
+    # --- memory tier ---
+    def _remember(self, k: tuple, vec: List[float]):
+        self._lru[k] = vec
+        self._lru.move_to_end(k)
+        while len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model: str, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Return {text: vector} for every text already cached under `model`."""
+        found: Dict[str, List[float]] = {}
+        pending: Dict[str, str] = {}
+        with self._lock:
+            for t in texts:
+                if t in found or t in pending:
+                    continue
+                k = text_key(t)
+                vec = self._lru.get((model, k))
+                if vec is not None:
+                    self._lru.move_to_end((model, k))
+                    found[t] = vec
+                    self.hits_memory += 1
+                else:
+                    pending[t] = k
+
+            db = self._conn()
+            if db is not None and pending:
+                by_key = {k: t for t, k in pending.items()}
+                keys = list(by_key)
+                for i in range(0, len(keys), 500):
+                    part = keys[i:i+500]
+                    rows = db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(part))})",
+                        [model, *part],
+                    ).fetchall()
+                    for k, blob in rows:
+                        vec = array("f", blob).tolist()
+                        found[by_key[k]] = vec
+                        self._remember((model, k), vec)
+                        self.hits_disk += 1
+            self.misses += sum(1 for t in pending if t not in found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        with self._lock:
+            rows = []
+            for t, vec in items.items():
+                k = text_key(t)
+                self._remember((model, k), list(vec))
+                rows.append((model, k, len(vec), array("f", vec).tobytes()))
+            db = self._conn()
+            if db is not None and rows:
+                db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+                db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "memory_entries": len(self._lru),
+        }
+
+    def clear_memory(self):
+        with self._lock:
+            self._lru.clear()
@@ -1,55 +1,384 @@
 # backend/shared/embeddings.py
 from dotenv import load_dotenv; load_dotenv()
 
-import os, time
+import math, os, re, time, zlib
+from abc import ABC, abstractmethod
 import sys
-from typing import List, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
 
 # Add the current directory to the path so we can import from shared modules
 sys.path.append(os.path.dirname(__file__))
 
-from llm_clients import get_apim_client_for
+from embedding_cache import EmbeddingCache, normalize_text
+from rate_limiter import RateLimiter, retry_after_seconds, backoff_delay
 
 # Deployment name (from .env)
 DEPLOY_EMBED = os.getenv("AZURE_DEPLOY_EMBED", "text-embedding-3-small")
 
-# --- client singleton for this deployment ---
-_client = None
-def _client_once():
-    global _client
-    if _client is None:
-        _client = get_apim_client_for(DEPLOY_EMBED)
-    return _client
+# --- embedding cache (in-process LRU + SQLite on disk) ---
+_DATA_DIR = os.getenv("BACKEND_DATA_DIR") or os.path.join(os.path.dirname(__file__), "..", "data")
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(_DATA_DIR, "embedding_cache.sqlite"))
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+
+# EMBED_CACHE_PATH="" keeps the cache in memory only
+_cache = EmbeddingCache(EMBED_CACHE_PATH or None, capacity=EMBED_CACHE_SIZE)
+
+def cache_stats() -> dict:
+    return _cache.stats()
+
+# --- batch scheduling (concurrency + gateway rate limits; 0 disables a limit) ---
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "4"))
+EMBED_RPM = float(os.getenv("EMBED_RPM", "0"))
+EMBED_TPM = float(os.getenv("EMBED_TPM", "0"))
+
+_limiter = RateLimiter(rpm=EMBED_RPM, tpm=EMBED_TPM)
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; good enough for budgeting
+    return len(text) // 4 + 1
+
+# --- token-budget packing (per-request budget + per-input model limit) ---
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "16000"))
+EMBED_MODEL_MAX_TOKENS = int(os.getenv("EMBED_MODEL_MAX_TOKENS", "8000"))
+
+_packing = {"requests_sent": 0, "requests_fixed_size": 0, "texts_chunked": 0}
+
+def batch_stats() -> dict:
+    """Requests actually sent vs. what fixed-size batching would have sent."""
+    return {**_packing, "requests_saved": _packing["requests_fixed_size"] - _packing["requests_sent"]}
+
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    """Split text into pieces under max_tokens, preferring whitespace boundaries."""
+    limit = max(1, (max_tokens - 1) * 4)
+    pieces, start = [], 0
+    while start < len(text):
+        end = min(len(text), start + limit)
+        if end < len(text):
+            cut = text.rfind(" ", start, end)
+            if cut > start:
+                end = cut
+        pieces.append(text[start:end].strip() or text[start:end])
+        start = end
+    return pieces
+
+def _pack(pieces: List[str], batch_size: int, max_tokens: int) -> List[List[int]]:
+    """Greedily pack piece indices into requests under both item and token limits."""
+    batches, cur, cur_tokens = [], [], 0
+    for i, p in enumerate(pieces):
+        t = estimate_tokens(p)
+        if cur and (len(cur) >= batch_size or cur_tokens + t > max_tokens):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += t
+    if cur:
+        batches.append(cur)
+    return batches
+
+def _pool(vectors: List[List[float]], weights: List[int]) -> List[float]:
+    """Token-weighted mean of chunk vectors, re-normalized to unit length."""
+    dims = len(vectors[0])
+    total = float(sum(weights))
+    out = [sum(v[d] * w for v, w in zip(vectors, weights)) / total for d in range(dims)]
+    norm = math.sqrt(sum(x * x for x in out)) or 1.0
+    return [x / norm for x in out]
+
+# =====================================================
+# Embedding providers (EMBED_PROVIDER=apim | local)
+# =====================================================
+class EmbeddingProvider(ABC):
+    """
+    Minimal provider interface. `name` identifies the vector space (it is part of
+    every cache key); `remote` providers go through the cache, packing and rate limits.
+    """
+    name = "base"
+    remote = True
+
+    @abstractmethod
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """One vector per text, in order."""
+
+
+class ApimEmbeddingProvider(EmbeddingProvider):
+    """Azure OpenAI embedding deployment behind the APIM gateway."""
+
+    def __init__(self, deployment: str):
+        self.name = deployment
+        self._client = None
+
+    def _client_once(self):
+        if self._client is None:
+            from llm_clients import get_apim_client_for
+            self._client = get_apim_client_for(self.name)
+        return self._client
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        resp = self._client_once().embeddings.create(
+            model=self.name,  # APIM expects the deployment name here
+            input=texts
+        )
+        return [d.embedding for d in resp.data]
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic offline embeddings: signed feature hashing of word unigrams and
+    bigrams (sublinear tf) into a fixed number of dims, L2-normalized.
+    No network, no state; meant for CI, load tests and disaster-mode serving.
+    """
+    remote = False
+
+    def __init__(self, dims: int = 1536):
+        self.dims = dims
+        self.name = f"local-hash-{dims}"
+
+    def embed_one(self, text: str) -> List[float]:
+        words = _TOKEN_RE.findall((text or "").lower())
+        counts: dict = {}
+        for feat in words + [a + " " + b for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(feat.encode("utf-8"))
+            counts[h] = counts.get(h, 0) + 1
+        vec = [0.0] * self.dims
+        touched = set()
+        for h, c in counts.items():
+            w = 1.0 + math.log(c)
+            i = h % self.dims
+            vec[i] += w if (h >> 31) & 1 else -w
+            touched.add(i)
+        # only touched dims are non-zero, so normalize those alone
+        norm = math.sqrt(sum(vec[i] * vec[i] for i in touched))
+        if norm:
+            for i in touched:
+                vec[i] /= norm
+        return vec
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_one(t) for t in texts]
+
+
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "apim").lower()
+EMBED_LOCAL_DIMS = int(os.getenv("EMBED_LOCAL_DIMS", "1536"))
+
+_PROVIDERS = {
+    "apim": lambda: ApimEmbeddingProvider(DEPLOY_EMBED),
+    "local": lambda: HashingEmbeddingProvider(EMBED_LOCAL_DIMS),
+}
+_provider: EmbeddingProvider = None
+
+def register_provider(key: str, factory):
+    _PROVIDERS[key.lower()] = factory
+
+def set_provider(provider: Union[str, EmbeddingProvider]) -> EmbeddingProvider:
+    global _provider
+    if isinstance(provider, str):
+        if provider.lower() not in _PROVIDERS:
+            raise ValueError(f"Unknown embedding provider '{provider}' (known: {', '.join(_PROVIDERS)})")
+        provider = _PROVIDERS[provider.lower()]()
+    _provider = provider
+    return _provider
+
+def get_provider() -> EmbeddingProvider:
+    return _provider or set_provider(EMBED_PROVIDER)
 
 # --- Core single-call embedding ---
 def _embed_batch(texts: List[str]) -> List[List[float]]:
-    resp = _client_once().embeddings.create(
-        model=DEPLOY_EMBED,  # APIM expects the deployment name here
-        input=texts
-    )
-    return [d.embedding for d in resp.data]
+    return get_provider().embed_batch(texts)
+
+def _embed_batch_with_retry(chunk: List[str], max_retries: int) -> List[List[float]]:
+    tokens = sum(estimate_tokens(t) for t in chunk)
+    for attempt in range(max_retries):
+        _limiter.acquire(tokens)
+        try:
+            return _embed_batch(chunk)
+        except Exception as e:
+            if attempt == max_retries - 1:
+                raise
+            wait = retry_after_seconds(e)
+            time.sleep(wait if wait is not None else backoff_delay(attempt))
+
+def _embed_uncached(texts: List[str], batch_size: int, max_retries: int) -> List[List[float]]:
+    # texts over the model limit are chunked; chunk vectors are pooled back per text
+    pieces: List[str] = []
+    owners: List[int] = []
+    for i, t in enumerate(texts):
+        parts = _split_long(t, EMBED_MODEL_MAX_TOKENS) if estimate_tokens(t) > EMBED_MODEL_MAX_TOKENS else [t]
+        if len(parts) > 1:
+            _packing["texts_chunked"] += 1
+        pieces.extend(parts)
+        owners.extend([i] * len(parts))
+
+    chunks = [[pieces[j] for j in idx] for idx in _pack(pieces, batch_size, EMBED_BATCH_TOKENS)]
+    _packing["requests_sent"] += len(chunks)
+    _packing["requests_fixed_size"] += math.ceil(len(texts) / batch_size)
+
+    if len(chunks) <= 1 or EMBED_MAX_CONCURRENCY <= 1:
+        results = [_embed_batch_with_retry(c, max_retries) for c in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(EMBED_MAX_CONCURRENCY, len(chunks))) as pool:
+            # map() yields in submission order, so output order matches input order
+            results = list(pool.map(lambda c: _embed_batch_with_retry(c, max_retries), chunks))
+    flat = [vec for batch in results for vec in batch]
+
+    if len(flat) == len(texts):
+        return flat
+    grouped: List[List[int]] = [[] for _ in texts]
+    for j, owner in enumerate(owners):
+        grouped[owner].append(j)
+    return [
+        flat[js[0]] if len(js) == 1
+        else _pool([flat[j] for j in js], [estimate_tokens(pieces[j]) for j in js])
+        for js in grouped
+    ]
 
 def embed_many(texts: List[str], batch_size: int = 64, max_retries: int = 3) -> List[List[float]]:
-    out: List[List[float]] = []
-    for i in range(0, len(texts), batch_size):
-        chunk = texts[i:i+batch_size]
-        for attempt in range(max_retries):
-            try:
-                out.extend(_embed_batch(chunk))
-                break
-            except Exception:
-                if attempt == max_retries - 1:
-                    raise
-                time.sleep(1.5 * (attempt + 1))  # basic backoff
-    return out
+    """
+    Embed texts in input order. Only cache misses (deduplicated) go upstream;
+    the cache key is (provider name, normalized text hash).
+    """
+    provider = get_provider()
+    norm = [normalize_text(t) for t in texts]
+    if not provider.remote:
+        return provider.embed_batch(norm)
+    found = _cache.get_many(provider.name, norm)
+    misses = list(dict.fromkeys(t for t in norm if t not in found))
+    if misses:
+        fresh = dict(zip(misses, _embed_uncached(misses, batch_size, max_retries)))
+        _cache.put_many(provider.name, fresh)
+        found.update(fresh)
+    return [found[t] for t in norm]
 
 def embed_text(text: str) -> List[float]:
     return embed_many([text])[0]
 
-# cosine helper (unchanged)
+# cosine helper (single pair; use cosine_many/topk for catalog scans)
 def cosine(a: Union[List[float], "np.ndarray"], b: Union[List[float], "np.ndarray"]) -> float:
-    import numpy as np
-    a = np.array(a, dtype=float); b = np.array(b, dtype=float)
+    a = np.asarray(a, dtype=float); b = np.asarray(b, dtype=float)
     denom = (np.linalg.norm(a) * np.linalg.norm(b))
     if denom == 0: return 0.0
-    return float(np.dot(a, b) / denom)
\ No newline at end of file
+    return float(np.dot(a, b) / denom)
+
+
+# =====================================================
+# Vectorized similarity over pre-normalized float32 matrices
+# =====================================================
+# rows whose norm is this close to 1 count as unit already
+_UNIT_TOLERANCE = 1e-5
+
+def normalize_rows(matrix) -> np.ndarray:
+    """
+    Stack vectors into a C-contiguous float32 matrix of unit rows (zero rows stay zero).
+    Rows that are already unit are left byte-for-byte as they are, so vectors reused from
+    a previous build don't drift (and change the index checksum) on every rebuild.
+    """
+    m = np.array(matrix, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[(norms == 0) | (np.abs(norms - 1.0) <= _UNIT_TOLERANCE)] = 1.0
+    m /= norms
+    return np.ascontiguousarray(m)
+
+def as_unit(vec) -> np.ndarray:
+    v = np.asarray(vec, dtype=np.float32)
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+def cosine_many(query, matrix: np.ndarray) -> np.ndarray:
+    """
+    Cosine of one query against every row of `matrix`.
+    `matrix` must already have unit rows (see normalize_rows); the query is normalized here.
+    """
+    return np.asarray(matrix, dtype=np.float32) @ as_unit(query)
+
+def topk(query, matrix: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the k most similar rows, best first (argpartition, then sort k)."""
+    scores = cosine_many(query, matrix)
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    idx = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+    idx = idx[np.argsort(-scores[idx], kind="stable")]
+    return idx, scores[idx]
+
+def topk_many(queries, matrix: np.ndarray, k: int, exclude: Optional[np.ndarray] = None,
+              chunk: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched topk: one matrix-matrix product per `chunk` query rows. Returns (n, k)
+    index and score arrays, best first per row. exclude: optional per-query row index
+    (-1 for none) that is never returned; rows that run out of candidates are padded
+    with index -1 and score -inf.
+    """
+    q = normalize_rows(queries)
+    n, rows = q.shape[0], matrix.shape[0]
+    k = min(k, rows)
+    idx_out = np.full((n, max(k, 0)), -1, dtype=np.int64)
+    score_out = np.full((n, max(k, 0)), -np.inf, dtype=np.float32)
+    if k <= 0:
+        return idx_out, score_out
+    m = np.asarray(matrix, dtype=np.float32)
+    for start in range(0, n, chunk):
+        scores = q[start:start+chunk] @ m.T
+        if exclude is not None:
+            ex = np.asarray(exclude[start:start+chunk])
+            hit = np.flatnonzero(ex >= 0)
+            scores[hit, ex[hit]] = -np.inf
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < rows else \
+            np.broadcast_to(np.arange(rows), scores.shape).copy()
+        part = np.take_along_axis(scores, idx, axis=1)
+        order = np.argsort(-part, axis=1, kind="stable")
+        idx = np.take_along_axis(idx, order, axis=1)
+        part = np.take_along_axis(part, order, axis=1)
+        idx[np.isneginf(part)] = -1
+        idx_out[start:start+chunk], score_out[start:start+chunk] = idx, part
+    return idx_out, score_out
+
+
+class VectorCatalog(list):
+    """
+    Catalog rows (plain dicts, vectors stripped) plus one pre-normalized float32
+    matrix; row i of `matrix` is the vector of item i. Behaves like the list of
+    dicts the loaders used to return.
+    """
+
+    def __init__(self, rows: List[Dict], matrix: np.ndarray, info: Optional[Dict] = None):
+        super().__init__(rows)
+        self.matrix = matrix
+        self.info = info or {}
+        self.ann = None  # optional search engine over `matrix` (see ann.py)
+        self.lexical = None  # optional BM25 prefilter for hybrid search (see lexical_index.py)
+
+    def search(self, query, k: int, text: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows for a query vector, scored by cosine. With `text` and an attached lexical
+        index, a BM25 shortlist is ranked by fused lexical + vector score (hybrid); otherwise
+        the attached ANN engine if any, else an exact scan.
+        """
+        if text and self.lexical is not None:
+            hit = self.lexical.hybrid_search(self, query, text, k)
+            if hit is not None:
+                return hit
+        if self.ann is not None:
+            return self.ann.search(query, k)
+        return topk(query, self.matrix, k)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict], text_fn: Optional[Callable[[Dict], str]] = None,
+                  key: str = "vector") -> "VectorCatalog":
+        """
+        Build from dicts carrying `key` vectors. Rows without a vector are embedded
+        in one embed_many call from text_fn(row) (required if any are missing).
+        """
+        vecs = [r.get(key) for r in rows]
+        missing = [i for i, v in enumerate(vecs) if v is None or len(v) == 0]
+        if missing:
+            if text_fn is None:
+                raise ValueError(f"{len(missing)} catalog rows have no '{key}' and no text_fn was given")
+            for i, v in zip(missing, embed_many([text_fn(rows[i]) for i in missing])):
+                vecs[i] = v
+        stripped = [{k: v for k, v in r.items() if k != key} for r in rows]
+        matrix = normalize_rows(vecs) if rows else np.zeros((0, 0), dtype=np.float32)
+        return cls(stripped, matrix, info={"embedded": len(missing)} if missing else None)
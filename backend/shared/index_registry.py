@@ -0,0 +1,96 @@
+# backend/shared/index_registry.py
+import threading, time, traceback
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+class IndexGeneration:
+    """One immutable set of loaded catalogs, tagged with the version it was built from."""
+
+    def __init__(self, version: str, catalogs: Dict[str, list]):
+        self.version = version
+        self.catalogs = catalogs
+        self.loaded_at = datetime.now().isoformat()
+
+    def __getitem__(self, name: str):
+        return self.catalogs[name]
+
+
+class IndexRegistry:
+    """
+    Serves the current IndexGeneration and hot-swaps in a new one when the on-disk
+    fingerprint (manifest version / checksums / mtimes) changes.
+
+    - The first current() call loads synchronously, under a lock, exactly once.
+    - Afterwards the fingerprint is checked at most every `poll_seconds`; a change
+      builds the next generation on a background thread while requests keep using
+      the old one, then swaps the reference in a single assignment.
+    - Callers should grab one generation per request so all catalogs stay consistent.
+    """
+
+    def __init__(self, loader: Callable[[], Dict[str, list]], fingerprint: Callable[[], str],
+                 poll_seconds: float = 30.0):
+        self._loader = loader
+        self._fingerprint = fingerprint
+        self.poll_seconds = poll_seconds
+        self._current: Optional[IndexGeneration] = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._last_check = 0.0
+        self.last_error: Optional[str] = None
+
+    def _build(self, version: str) -> IndexGeneration:
+        return IndexGeneration(version, self._loader())
+
+    def current(self) -> IndexGeneration:
+        gen = self._current
+        if gen is None:
+            with self._lock:
+                if self._current is None:
+                    fp = self._fingerprint()
+                    self._current = self._build(fp)
+                    self._last_check = time.monotonic()
+                return self._current
+        self._maybe_reload(gen)
+        return gen
+
+    @property
+    def version(self) -> Optional[str]:
+        gen = self._current
+        return gen.version if gen else None
+
+    def _maybe_reload(self, gen: IndexGeneration):
+        now = time.monotonic()
+        if self._reloading or now - self._last_check < self.poll_seconds:
+            return
+        with self._lock:
+            if self._reloading or now - self._last_check < self.poll_seconds:
+                return
+            self._last_check = now
+            try:
+                fp = self._fingerprint()
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                return
+            if fp == gen.version:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(fp,), daemon=True, name="index-reload").start()
+
+    def _reload(self, fp: str):
+        try:
+            new_gen = self._build(fp)
+            self._current = new_gen  # atomic reference swap; in-flight requests keep the old one
+            self.last_error = None
+        except Exception as e:
+            # keep serving the previous generation; retry on the next poll
+            self.last_error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            self._reloading = False
+
+    def reload_now(self) -> IndexGeneration:
+        """Synchronously rebuild and swap (admin / tests)."""
+        with self._lock:
+            self._current = self._build(self._fingerprint())
+            self._last_check = time.monotonic()
+            return self._current
@@ -0,0 +1,110 @@
+# backend/shared/index_store.py
+"""
+Binary on-disk format for the role / course / mentor indices.
+
+For each index <name> the data dir holds:
+  - index_<name>.npy        contiguous float32 matrix of unit-normalized vectors
+  - index_<name>.meta.json  compact JSON list of the rows without their vectors
+and a single index_manifest.json describing every index (rows, dims, provider,
+checksum) plus a global version that increases whenever an index changes.
+
+Loading memory-maps the .npy, so cold start does not parse vectors and the pages
+are shared between worker processes through the OS page cache. The legacy
+index_<name>.json files remain supported for import/export.
+"""
+import hashlib, io, json, os, sys, threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+# Add the current directory to the path so we can import from shared modules
+sys.path.append(os.path.dirname(__file__))
+
+from embeddings import VectorCatalog, get_provider
+from checkpoint import atomic_write_bytes
+
+MANIFEST = "index_manifest.json"
+_manifest_lock = threading.Lock()
+
+def _paths(data_dir: Union[str, Path], name: str) -> Dict[str, Path]:
+    d = Path(data_dir)
+    return {
+        "matrix": d / f"index_{name}.npy",
+        "meta": d / f"index_{name}.meta.json",
+        "json": d / f"index_{name}.json",
+    }
+
+def read_manifest(data_dir: Union[str, Path]) -> Dict:
+    p = Path(data_dir) / MANIFEST
+    if not p.exists():
+        return {"version": 0, "indices": {}}
+    with open(p, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_binary_index(catalog: Union[VectorCatalog, List[Dict]], data_dir: Union[str, Path], name: str) -> Dict:
+    """Write matrix + metadata sidecar atomically, then bump the manifest entry (no-op if unchanged)."""
+    if getattr(catalog, "matrix", None) is None:
+        catalog = VectorCatalog.from_rows(list(catalog))
+    paths = _paths(data_dir, name)
+    paths["matrix"].parent.mkdir(parents=True, exist_ok=True)
+
+    buf = io.BytesIO()
+    np.save(buf, np.ascontiguousarray(catalog.matrix, dtype=np.float32))
+    matrix_bytes = buf.getvalue()
+    meta_bytes = json.dumps(list(catalog), separators=(",", ":"), default=str).encode("utf-8")
+    checksum = hashlib.sha256(matrix_bytes).hexdigest()
+
+    # unchanged rebuild: leave files and manifest version alone so readers don't reload
+    old = read_manifest(data_dir).get("indices", {}).get(name)
+    if old and old.get("checksum") == checksum and paths["meta"].exists() \
+            and paths["meta"].read_bytes() == meta_bytes:
+        return old
+
+    atomic_write_bytes(paths["matrix"], matrix_bytes)
+    atomic_write_bytes(paths["meta"], meta_bytes)
+
+    entry = {
+        "rows": int(catalog.matrix.shape[0]),
+        "dims": int(catalog.matrix.shape[1]) if catalog.matrix.ndim == 2 else 0,
+        "dtype": "float32",
+        "normalized": True,
+        "provider": getattr(catalog, "info", {}).get("provider") or get_provider().name,
+        "checksum": checksum,
+        "built_at": datetime.now().isoformat(),
+    }
+    with _manifest_lock:
+        manifest = read_manifest(data_dir)
+        manifest["version"] = int(manifest.get("version", 0)) + 1
+        manifest.setdefault("indices", {})[name] = entry
+        atomic_write_bytes(Path(data_dir) / MANIFEST, json.dumps(manifest, indent=2).encode("utf-8"))
+    return entry
+
+def load_binary_index(data_dir: Union[str, Path], name: str, mmap: bool = True) -> Optional[VectorCatalog]:
+    """Memory-map index <name>; returns None when no binary index exists yet."""
+    paths = _paths(data_dir, name)
+    entry = read_manifest(data_dir).get("indices", {}).get(name)
+    if entry is None or not paths["matrix"].exists() or not paths["meta"].exists():
+        return None
+    matrix = np.load(paths["matrix"], mmap_mode="r" if mmap else None)
+    with open(paths["meta"], "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    if len(rows) != matrix.shape[0]:
+        raise ValueError(f"Index '{name}' is inconsistent: {len(rows)} rows vs matrix {matrix.shape}")
+    return VectorCatalog(rows, matrix, info=entry)
+
+# --- JSON import / export (legacy index_<name>.json with inline vectors) ---
+def import_json_index(json_path: Union[str, Path], data_dir: Union[str, Path], name: str, text_fn=None) -> Dict:
+    with open(json_path, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    return save_binary_index(VectorCatalog.from_rows(rows, text_fn=text_fn), data_dir, name)
+
+def export_json_index(data_dir: Union[str, Path], name: str, json_path: Optional[Union[str, Path]] = None) -> Path:
+    cat = load_binary_index(data_dir, name, mmap=False)
+    if cat is None:
+        raise FileNotFoundError(f"No binary index '{name}' in {data_dir}")
+    out = Path(json_path) if json_path else _paths(data_dir, name)["json"]
+    rows = [{**r, "vector": [float(x) for x in vec]} for r, vec in zip(cat, cat.matrix)]
+    atomic_write_bytes(out, json.dumps(rows, indent=2).encode("utf-8"))
+    return out
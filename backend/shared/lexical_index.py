@@ -0,0 +1,126 @@
+# backend/shared/lexical_index.py
+"""
+BM25 inverted index over catalog text, used as a cheap candidate prefilter.
+
+Hybrid retrieval: BM25 picks a shortlist of `pool` rows, then lexical and vector
+scores are fused only on that shortlist,
+    fused = weight * bm25 / max(bm25) + (1 - weight) * cosine
+so the vector side is a small gather + matrix-vector product instead of a scan
+over the whole catalog. The fused score only ranks; the selected rows are returned
+with their cosine, so scores mean the same as on the pure vector path. Queries with too few lexical hits, and catalogs below
+HYBRID_MIN_ROWS, fall back to the pure vector search.
+"""
+import io, os, re, sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+# Add the current directory to the path so we can import from shared modules
+sys.path.append(os.path.dirname(__file__))
+
+from checkpoint import atomic_write_bytes
+
+HYBRID_WEIGHT = float(os.getenv("HYBRID_WEIGHT", "0.3"))      # lexical share of the fused score
+HYBRID_POOL = int(os.getenv("HYBRID_POOL", "200"))            # BM25 shortlist size
+HYBRID_MIN_ROWS = int(os.getenv("HYBRID_MIN_ROWS", "5000"))   # smaller catalogs: exact vector scan
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"a", "an", "and", "the", "of", "for", "in", "to", "on", "with", "by", "or", "skills", "required"}
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+                 doc_len: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.terms = {t: i for i, t in enumerate(terms)}
+        self.offsets, self.docs, self.tfs, self.doc_len = offsets, docs, tfs, doc_len
+        self.k1, self.b = k1, b
+        n = max(1, doc_len.shape[0])
+        df = np.diff(offsets)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self._avg_len = float(doc_len.mean()) if doc_len.size else 0.0
+
+    def __len__(self) -> int:
+        return int(self.doc_len.shape[0])
+
+    @classmethod
+    def build(cls, texts: List[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        terms: Dict[str, int] = {}
+        term_ids, doc_ids, tfs = [], [], []
+        doc_len = np.zeros(len(texts), dtype=np.float32)
+        for d, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_len[d] = sum(counts.values())
+            for t, c in counts.items():
+                term_ids.append(terms.setdefault(t, len(terms)))
+                doc_ids.append(d)
+                tfs.append(c)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")  # CSR: postings grouped by term, docs ascending
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(terms)))]).astype(np.int64)
+        return cls(list(terms), offsets, np.asarray(doc_ids, dtype=np.int64)[order],
+                   np.asarray(tfs, dtype=np.float32)[order], doc_len, k1=k1, b=b)
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc positions, BM25 scores) for every doc containing at least one query term."""
+        ids = [self.terms[t] for t in set(tokenize(query)) if t in self.terms]
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        docs = np.concatenate([self.docs[self.offsets[i]:self.offsets[i + 1]] for i in ids])
+        tf = np.concatenate([self.tfs[self.offsets[i]:self.offsets[i + 1]] for i in ids])
+        idf = np.concatenate([np.full(self.offsets[i + 1] - self.offsets[i], self.idf[i]) for i in ids])
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / (self._avg_len or 1.0))
+        partial = idf * tf * (self.k1 + 1) / (tf + norm)
+        uniq, inverse = np.unique(docs, return_inverse=True)
+        return uniq, np.bincount(inverse, weights=partial).astype(np.float32)
+
+    def top(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        docs, s = self.scores(query)
+        if docs.size > k:
+            keep = np.argpartition(-s, k - 1)[:k]
+            docs, s = docs[keep], s[keep]
+        order = np.argsort(-s, kind="stable")
+        return docs[order], s[order]
+
+    def hybrid_search(self, catalog, query, text: str, k: int, pool: int = HYBRID_POOL,
+                      weight: float = HYBRID_WEIGHT,
+                      min_rows: int = HYBRID_MIN_ROWS) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Top-k of the BM25 shortlist ranked by fused score, as (positions, cosine scores);
+        None when the caller should do a vector search.
+        """
+        if not text or len(catalog) < max(1, min_rows):
+            return None
+        cand, bm = self.top(text, max(pool, k))
+        if cand.size < k:
+            return None  # too few lexical hits to prefilter safely
+        q = np.asarray(query, dtype=np.float32)
+        qn = float(np.linalg.norm(q))
+        cos = np.asarray(catalog.matrix[np.sort(cand)], dtype=np.float32) @ (q / qn if qn else q)
+        cos = cos[np.argsort(np.argsort(cand))]  # back to shortlist order
+        fused = weight * bm / (float(bm.max()) or 1.0) + (1 - weight) * cos
+        best = np.argsort(-fused, kind="stable")[:k]
+        return cand[best], cos[best].astype(np.float32)
+
+    # --- persistence (index_<name>.bm25.npz next to the binary index) ---
+    def save(self, path: Union[str, Path], checksum: str = ""):
+        buf = io.BytesIO()
+        np.savez(buf, terms=np.array(list(self.terms), dtype=str), offsets=self.offsets, docs=self.docs,
+                 tfs=self.tfs, doc_len=self.doc_len, params=np.array([self.k1, self.b]), checksum=np.str_(checksum))
+        atomic_write_bytes(path, buf.getvalue())
+
+    @classmethod
+    def load(cls, path: Union[str, Path], rows: int, checksum: str = "") -> Optional["BM25Index"]:
+        """None when the file is missing or was built for a different index."""
+        if not Path(path).exists():
+            return None
+        with np.load(path) as z:
+            if z["doc_len"].shape[0] != rows or (checksum and str(z["checksum"]) != checksum):
+                return None
+            k1, b = (float(x) for x in z["params"])
+            return cls([str(t) for t in z["terms"]], z["offsets"], z["docs"], z["tfs"], z["doc_len"], k1=k1, b=b)
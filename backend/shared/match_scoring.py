@@ -0,0 +1,125 @@
+# backend/shared/match_scoring.py
+"""
+Vectorized dashboard match scoring (RecommendationsService course / career pathway matches).
+
+A MatchScorer is built once per catalog snapshot: required skills as one packed
+bitset matrix (shared VOCAB ids), title tokens as flat (row, token id) arrays and
+the seniority keywords as boolean columns. Scoring a user is then a handful of
+NumPy operations over all rows, with the same float arithmetic, bonuses and caps
+as RecommendationsService._calculate_skill_match_score / _calculate_job_title_match_score,
+and top_k() picks the best rows by partial selection instead of a full sort.
+"""
+import os, sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add the current directory to the path so we can import from shared modules
+sys.path.append(os.path.dirname(__file__))
+
+from skill_normalizer import VOCAB, overlap_stats
+
+# (user title keyword, target title keyword, bonus), first match wins
+SENIORITY_BONUSES = [("manager", "director", 20), ("analyst", "manager", 15), ("architect", "senior", 10)]
+
+
+def warm_row(row: Dict[str, Any], title_field: str) -> Dict[str, Any]:
+    """
+    Per-row scoring inputs (e.g. computed once per row by catalog_cache). Built here so the
+    bitsets use this module's VOCAB, the same one MatchScorer encodes users with.
+    """
+    return {
+        "skill_bits": VOCAB.bitset(row.get("required_skills") or []),
+        "title_keywords": set((row.get(title_field) or "").lower().split()),
+    }
+
+
+def top_k(keys: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k largest keys, highest first and lowest position first among
+    ties (the order of a stable sort(reverse=True)), via partial selection.
+    """
+    n = keys.shape[0]
+    if n == 0 or k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth = np.partition(keys, n - k)[n - k]
+        above = np.flatnonzero(keys > kth)
+        cand = np.concatenate([above, np.flatnonzero(keys == kth)[:k - above.size]])
+    else:
+        cand = np.arange(n)
+    return cand[np.lexsort((cand, -keys[cand]))]
+
+
+class MatchScorer:
+
+    def __init__(self, rows: List[Dict[str, Any]], title_field: str, warmed: Optional[List[Dict]] = None):
+        """
+        rows: catalog rows with required_skills and `title_field`; warmed: optional per-row
+        warm_row() values (e.g. from catalog_cache) reused instead of recomputed.
+        """
+        n = len(rows)
+        warmed = warmed or [warm_row(r, title_field) for r in rows]
+        bits = [w["skill_bits"] for w in warmed]
+        self.skill_bits = np.zeros((n, max([b.shape[-1] for b in bits] + [1])), dtype=np.uint8)
+        for i, b in enumerate(bits):
+            self.skill_bits[i, :b.shape[-1]] = b
+        self.has_required = np.array([bool(r.get("required_skills")) for r in rows], dtype=bool)
+
+        titles = [r.get(title_field) or "" for r in rows]
+        lowered = [t.lower() for t in titles]
+        self.has_title = np.array([bool(t) for t in titles], dtype=bool)
+        self.titles = np.array(lowered, dtype=object)
+        self.targets = {kw: np.array([kw in t for t in lowered], dtype=bool) for _, kw, _ in SENIORITY_BONUSES}
+
+        self.tokens: Dict[str, int] = {}
+        token_rows, token_ids = [], []
+        for i, w in enumerate(warmed):
+            for tok in w["title_keywords"]:
+                token_rows.append(i)
+                token_ids.append(self.tokens.setdefault(tok, len(self.tokens)))
+        self.token_rows = np.asarray(token_rows, dtype=np.int64)
+        self.token_ids = np.asarray(token_ids, dtype=np.int64)
+        self.token_count = np.bincount(self.token_rows, minlength=n).astype(np.int64)
+
+    def __len__(self) -> int:
+        return int(self.has_required.shape[0])
+
+    def skill_scores(self, user_skills: List[str]) -> np.ndarray:
+        # add=False: skills no row requires cannot overlap, and must not grow the shared vocabulary
+        stats = overlap_stats(VOCAB.bitset(user_skills, add=False), self.skill_bits)
+        overlap, required = stats["overlap"], stats["required"]
+        score = (overlap / np.maximum(required, 1)) * 100
+        score = score + np.where(overlap >= required * 0.5, 10, 0)  # at least half the required skills
+        score = score + np.where(overlap == required, 15, 0)        # all of them
+        score = np.minimum(score, 100)
+        score[~self.has_required | (required == 0)] = 0.0
+        return score
+
+    def title_scores(self, user_job_title: str) -> np.ndarray:
+        user_title = user_job_title.lower()
+        member = np.zeros(len(self.tokens), dtype=bool)
+        member[np.array([self.tokens[t] for t in set(user_title.split()) if t in self.tokens], dtype=np.int64)] = True
+        overlap = np.bincount(self.token_rows, weights=member[self.token_ids], minlength=len(self))
+        score = (overlap / np.maximum(self.token_count, 1)) * 100
+        rules = [(self.targets[target], b) for user, target, b in SENIORITY_BONUSES if user in user_title]
+        bonus = np.select([m for m, _ in rules], [b for _, b in rules], 0) if rules else 0
+        score = np.minimum(score + bonus, 100)
+        score[self.token_count == 0] = 0.0
+        score[self.titles == user_title] = 100.0
+        score[~self.has_title] = 0.0
+        return score
+
+    def top(self, user_skills: List[str], user_job_title: str, k: int,
+            weights: Tuple[float, float]) -> np.ndarray:
+        """
+        Best k row positions by round(skill * weights[0] + title * weights[1], 1),
+        ties in catalog order.
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.int64)
+        combined = self.skill_scores(user_skills) * weights[0] + self.title_scores(user_job_title) * weights[1]
+        # Python's round() on the (few) distinct values, so ties match the rounded match_score exactly
+        values, inverse = np.unique(combined, return_inverse=True)
+        keys = np.array([round(float(v), 1) for v in values])[inverse.reshape(-1)]
+        return top_k(keys, k)
@@ -0,0 +1,133 @@
+# backend/shared/mentor_search.py
+"""
+Filtered nearest-neighbour search over the mentor catalog.
+
+Boolean masks per department, job level and availability are built once per
+loaded catalog; a query ANDs the requested masks (and drops the requesting
+employee), ranks only the surviving rows, and returns lightweight records.
+"""
+import os, re, sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Add the current directory to the path so we can import from shared modules
+sys.path.append(os.path.dirname(__file__))
+
+from embeddings import topk, topk_many
+
+# ordered most senior first; the first pattern that matches a job title wins
+JOB_LEVELS = [
+    ("executive", re.compile(r"\b(chief|head|vp|vice president|director|general manager)\b")),
+    ("manager", re.compile(r"\b(manager|lead|supervisor)\b")),
+    ("senior", re.compile(r"\b(senior|principal|architect|specialist|sr)\b")),
+]
+DEFAULT_LEVEL = "associate"
+
+# fields copied into search results (never the vector)
+RECORD_FIELDS = ("id", "name", "job_title", "department", "job_level", "skills")
+
+def job_level(title: str) -> str:
+    t = (title or "").lower()
+    return next((level for level, pat in JOB_LEVELS if pat.search(t)), DEFAULT_LEVEL)
+
+def _key(value) -> str:
+    return str(value or "").strip().lower()
+
+
+class MentorSearch:
+
+    def __init__(self, catalog):
+        """catalog: VectorCatalog of mentor rows (id, name, job_title, department, job_level, available)."""
+        self.catalog = catalog
+        n = len(catalog)
+        self.positions: Dict[str, int] = {str(r.get("id")): i for i, r in enumerate(catalog)}
+        self.available = np.array([bool(r.get("available", True)) for r in catalog], dtype=bool)
+        self.departments = self._masks([_key(r.get("department")) for r in catalog], n)
+        self.levels = self._masks([r.get("job_level") or job_level(r.get("job_title", "")) for r in catalog], n)
+
+    @staticmethod
+    def _masks(values: List[str], n: int) -> Dict[str, np.ndarray]:
+        masks: Dict[str, np.ndarray] = {}
+        for i, v in enumerate(values):
+            if v not in masks:
+                masks[v] = np.zeros(n, dtype=bool)
+            masks[v][i] = True
+        return masks
+
+    def has_department(self, department: str) -> bool:
+        return _key(department) in self.departments
+
+    def _any_of(self, masks: Dict[str, np.ndarray], keys: Iterable[str]) -> np.ndarray:
+        out = np.zeros(len(self.catalog), dtype=bool)
+        for k in keys:
+            if _key(k) in masks:
+                out |= masks[_key(k)]
+        return out
+
+    def mask(self, departments: Optional[Iterable[str]] = None, levels: Optional[Iterable[str]] = None,
+             available_only: bool = False) -> Optional[np.ndarray]:
+        """Rows allowed by the metadata filters; None when nothing is filtered out."""
+        mask = None
+        if departments:
+            mask = self._any_of(self.departments, departments)
+        if levels:
+            m = self._any_of(self.levels, levels)
+            mask = m if mask is None else mask & m
+        if available_only:
+            mask = self.available.copy() if mask is None else mask & self.available
+        return mask
+
+    def search(self, query, k: int, exclude_ids: Iterable = (), text: Optional[str] = None,
+               **filters) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k (positions, scores) among rows passing `filters` (see mask()), minus exclude_ids.
+        `text` enables the catalog's hybrid search on the unfiltered path.
+        """
+        drop = [self.positions[str(x)] for x in exclude_ids if str(x) in self.positions]
+        mask = self.mask(**filters)
+        if mask is None:
+            # unfiltered: the catalog's own engine (hybrid / ANN), over-fetching the excluded rows
+            idx, scores = self.catalog.search(query, k + len(drop), text=text)
+            keep = ~np.isin(idx, drop)
+            return idx[keep][:k], scores[keep][:k]
+        mask[drop] = False
+        cand = np.flatnonzero(mask)
+        if cand.size == 0:
+            return cand, np.empty(0, dtype=np.float32)
+        local, scores = topk(query, self.catalog.matrix[cand], k)
+        return cand[local], scores
+
+    def search_many(self, queries, k: int, exclude_ids: Optional[List] = None,
+                    **filters) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batched search() for a stack of queries via matrix-matrix products (exact).
+        exclude_ids: optional one mentor id per query (e.g. the employee themself).
+        Returns (n, k) positions and scores; missing slots have position -1.
+        """
+        mask = self.mask(**filters)
+        cand = np.flatnonzero(mask) if mask is not None else None
+        matrix = self.catalog.matrix if cand is None else self.catalog.matrix[cand]
+        exclude = None
+        if exclude_ids is not None:
+            exclude = np.array([self.positions.get(str(x), -1) for x in exclude_ids], dtype=np.int64)
+            if cand is not None:  # global positions -> rows of the masked matrix
+                local = np.full(len(self.catalog) + 1, -1, dtype=np.int64)
+                local[cand] = np.arange(cand.size)
+                exclude = local[exclude]  # -1 stays -1 (last slot)
+        idx, scores = topk_many(queries, matrix, k, exclude=exclude)
+        if cand is not None and cand.size:
+            idx = np.where(idx >= 0, cand[np.maximum(idx, 0)], -1)
+        return idx, scores
+
+    def records(self, positions, scores) -> List[Dict]:
+        out = []
+        for i, s in zip(positions, scores):
+            if i < 0:
+                continue
+            row = self.catalog[int(i)]
+            rec = {f: row[f] for f in RECORD_FIELDS if f in row}
+            rec.setdefault("job_level", job_level(row.get("job_title", "")))
+            rec["match_score"] = round(100 * float(s), 1)
+            out.append(rec)
+        return out
@@ -0,0 +1,128 @@
+# backend/shared/plan_store.py
+"""
+Materialized per-employee recommendations.
+
+Each entry is keyed by (kind, user_id) and stamped with the profile hash and
+the catalog/index version it was computed from; get() only returns it while
+both still match, so a profile edit or an index rebuild invalidates it without
+any explicit purge. A background Refresher recomputes stale entries so request
+handlers are a key lookup, falling back to live computation on a miss.
+"""
+import json, os, sqlite3, threading, time, traceback
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class PlanStore:
+    """SQLite-backed (kind, user_id) -> payload store; kind separates e.g. "plan" and "dashboard"."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS materialized ("
+                " kind TEXT NOT NULL, user_id TEXT NOT NULL, profile_hash TEXT NOT NULL,"
+                " version TEXT NOT NULL, payload TEXT NOT NULL, updated_at TEXT NOT NULL,"
+                " PRIMARY KEY (kind, user_id))"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, kind: str, user_id: str, profile_hash: str, version: str) -> Optional[Dict]:
+        """The stored payload if it was computed from this profile hash and version, else None."""
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT profile_hash, version, payload FROM materialized WHERE kind = ? AND user_id = ?",
+                (kind, str(user_id)),
+            ).fetchone()
+            if row is None or row[0] != profile_hash or row[1] != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[2])
+
+    def put_many(self, kind: str, entries: Iterable[Tuple[str, str, str, Dict]]):
+        """entries: (user_id, profile_hash, version, payload) tuples, written in one transaction."""
+        now = datetime.now().isoformat()
+        rows = [(kind, str(u), h, v, json.dumps(p, default=str), now) for u, h, v, p in entries]
+        if not rows:
+            return
+        with self._lock:
+            db = self._conn()
+            db.executemany("INSERT OR REPLACE INTO materialized VALUES (?, ?, ?, ?, ?, ?)", rows)
+            db.commit()
+
+    def put(self, kind: str, user_id: str, profile_hash: str, version: str, payload: Dict):
+        self.put_many(kind, [(user_id, profile_hash, version, payload)])
+
+    def stale(self, kind: str, profile_hashes: Dict[str, str], version: str) -> List[str]:
+        """User ids whose entry is missing or was computed from another profile hash / version."""
+        with self._lock:
+            stored = dict(
+                (u, (h, v)) for u, h, v in self._conn().execute(
+                    "SELECT user_id, profile_hash, version FROM materialized WHERE kind = ?", (kind,))
+            )
+        return [u for u, h in profile_hashes.items() if stored.get(str(u)) != (h, version)]
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+class Refresher:
+    """
+    Calls `refresh()` (which recomputes stale entries and returns how many it wrote)
+    on a daemon thread every `interval` seconds. start() is idempotent; with
+    wait_first the first run is one interval after start() instead of immediate.
+    """
+
+    def __init__(self, refresh: Callable[[], int], interval: float, name: str = "plan-refresh",
+                 wait_first: bool = False):
+        self._refresh = refresh
+        self.interval = interval
+        self.name = name
+        self.wait_first = wait_first
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.last_run: Optional[str] = None
+        self.last_refreshed = 0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True, name=self.name)
+                self._thread.start()
+
+    def run_once(self) -> int:
+        try:
+            self.last_refreshed = self._refresh()
+            self.last_error = None
+        except Exception as e:
+            # keep serving what is stored (and live fallbacks); retry next interval
+            self.last_error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        self.last_run = datetime.now().isoformat()
+        return self.last_refreshed
+
+    def _loop(self):
+        if self.wait_first:
+            time.sleep(self.interval)
+        while True:
+            self.run_once()
+            time.sleep(self.interval)
+
+    def status(self) -> Dict:
+        return {"last_run": self.last_run, "last_refreshed": self.last_refreshed, "last_error": self.last_error}
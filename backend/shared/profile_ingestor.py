@@ -6,7 +6,9 @@ from datetime import datetime
 # Add the current directory to the path so we can import from shared modules
 sys.path.append(os.path.dirname(__file__))
 
-from embeddings import embed_text
+from embeddings import embed_many, get_provider
+from recommender import role_query_text
+from checkpoint import atomic_write_json, CHECKPOINT_EVERY
 
 class ProfileIngestor:
     """
@@ -15,9 +17,11 @@ class ProfileIngestor:
     Automatically embeds new/updated profiles only.
     """
 
-    def __init__(self, cache_path: Optional[str] = None):
+    def __init__(self, cache_path: Optional[str] = None, checkpoint_every: int = CHECKPOINT_EVERY):
         # Optional cache to store previous embeddings (avoid re-embedding)
         self.cache_path = cache_path or "profile_cache.json"
+        # changed profiles are embedded in chunks of this size; the cache is saved after each
+        self.checkpoint_every = max(1, checkpoint_every)
         self.cache = self._load_cache()
 
     def _load_cache(self) -> Dict:
@@ -27,12 +31,15 @@ class ProfileIngestor:
         return {}
 
     def _save_cache(self):
-        with open(self.cache_path, "w", encoding="utf-8") as f:
-            json.dump(self.cache, f, indent=2)
+        # write-then-rename, so a crash mid-write never corrupts the previous checkpoint
+        atomic_write_json(self.cache_path, self.cache, indent=2)
 
     def _hash_profile(self, p: Dict) -> str:
-        # Hash profile to detect changes
-        content = json.dumps(p, sort_keys=True)
+        # Hash profile + embedding space to detect changes: after switching EMBED_PROVIDER
+        # (or its dimensions) every profile is re-embedded instead of mixing vector spaces
+        provider = get_provider()
+        content = json.dumps({"profile": p, "provider": provider.name,
+                              "dims": getattr(provider, "dims", None)}, sort_keys=True)
         return hashlib.sha1(content.encode()).hexdigest()
 
     def _build_blob(self, e: Dict) -> str:
@@ -48,6 +55,14 @@ class ProfileIngestor:
             "projects: " + " || ".join(projects)
         ])
 
+    def _build_query(self, e: Dict) -> str:
+        # same text role_recommendations would build from the processed profile
+        return role_query_text({
+            "job_title": e.get("employment_info", {}).get("job_title", ""),
+            "top_skills": [s.get("skill_name","") for s in e.get("skills", [])],
+            "projects": [{"title": p.get("project_name","")} for p in e.get("projects", [])],
+        })
+
     def ingest_profiles(self, source: str | List[Dict]) -> List[Dict]:
         """Load and embed profiles from JSON file or list of dicts."""
         # 1️⃣ Load data
@@ -57,23 +72,55 @@ class ProfileIngestor:
         else:
             data = source
 
-        processed = []
+        # 2️⃣ Re-embed only new/changed profiles, checkpointing the cache every chunk.
+        # Each entry also caches the role-search query vector, so ranking roles needs no
+        # embedding call; entries from older caches only get the query vector backfilled.
+        hashes = {str(e.get("employee_id")): self._hash_profile(e) for e in data}
+        stale = [e for e in data
+                 if (self.cache.get(str(e.get("employee_id"))) or {}).get("hash") != hashes[str(e.get("employee_id"))]
+                 or "query_text" not in self.cache[str(e.get("employee_id"))]]
+        for i in range(0, len(stale), self.checkpoint_every):
+            chunk = stale[i:i+self.checkpoint_every]
+            texts = []
+            for e in chunk:
+                cached = self.cache.get(str(e.get("employee_id"))) or {}
+                if cached.get("hash") != hashes[str(e.get("employee_id"))]:
+                    texts.append(self._build_blob(e))
+                texts.append(self._build_query(e))
+            vecs = iter(embed_many(texts))
+            for e in chunk:
+                employee_id = str(e.get("employee_id"))
+                cached = self.cache.get(employee_id) or {}
+                if cached.get("hash") != hashes[employee_id]:
+                    cached = {
+                        "hash": hashes[employee_id],
+                        "vector": next(vecs),
+                        "last_embedded": datetime.now().isoformat()
+                    }
+                cached["query_text"] = self._build_query(e)  # lexical side of hybrid role search
+                cached["query_vector"] = next(vecs)
+                self.cache[employee_id] = cached
+            self._save_cache()
+
+        # Cheap fields, kept current without re-embedding: the canonical id (callers may
+        # reach an entry by a short key) and the text the profile vector encodes (the
+        # lexical side of hybrid mentor search)
+        dirty = False
         for e in data:
             employee_id = str(e.get("employee_id"))
-            profile_hash = self._hash_profile(e)
-            cached = self.cache.get(employee_id)
+            entry = self.cache[employee_id]
+            for field, value in (("employee_id", employee_id), ("profile_text", self._build_blob(e))):
+                if entry.get(field) != value:
+                    entry[field] = value
+                    dirty = True
+        if dirty:
+            self._save_cache()
 
-            # 2️⃣ If profile unchanged, reuse embedding
-            if cached and cached.get("hash") == profile_hash:
-                vec = cached["vector"]
-            else:
-                blob = self._build_blob(e)
-                vec = embed_text(blob)
-                self.cache[employee_id] = {
-                    "hash": profile_hash,
-                    "vector": vec,
-                    "last_embedded": datetime.now().isoformat()
-                }
+        processed = []
+        for e in data:
+            employee_id = str(e.get("employee_id"))
+            vec = self.cache[employee_id]["vector"]
+            query_vec = self.cache[employee_id]["query_vector"]
 
             # 3️⃣ Normalized structure
             processed.append({
@@ -84,7 +131,9 @@ class ProfileIngestor:
                 "skills": [s.get("skill_name","") for s in e.get("skills", [])],
                 "competencies": [c.get("name","") for c in e.get("competencies", [])],
                 "vector": vec,
+                "profile_text": self.cache[employee_id]["profile_text"],
+                "query_text": self.cache[employee_id].get("query_text", ""),
+                "query_vector": query_vec,
             })
 
-        self._save_cache()
-        return processed
\ No newline at end of file
+        return processed
@@ -0,0 +1,68 @@
+# backend/shared/rate_limiter.py
+import random, threading, time
+from typing import Optional
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute / 60` tokens per second.
+    A limit of 0 (or less) disables the bucket.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, n: float = 1.0):
+        if self.capacity <= 0:
+            return
+        n = min(float(n), self.capacity)  # oversized requests wait for a full bucket
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets acquired together."""
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, tokens: float = 0):
+        self.requests.acquire(1)
+        if tokens:
+            self.tokens.acquire(tokens)
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """Read Retry-After (or retry-after-ms) from an HTTP error's response, if any."""
+    resp = getattr(exc, "response", None)
+    headers = getattr(resp, "headers", None) or {}
+    try:
+        ms = headers.get("retry-after-ms")
+        if ms is not None:
+            return float(ms) / 1000.0
+        sec = headers.get("retry-after")
+        if sec is not None:
+            return float(sec)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def backoff_delay(attempt: int, base: float = 1.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -3,72 +3,109 @@
 import numpy as np
 import sys
 import os
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 # Add the current directory to the path so we can import from shared modules
 sys.path.append(os.path.dirname(__file__))
 
-from embeddings import embed_text, cosine
+from embeddings import embed_text, embed_many, normalize_rows, topk, topk_many, VectorCatalog
 from skill_normalizer import normalize_list
+from skill_vectors import SkillVectorStore
+from skill_index import InvertedSkillIndex
+from mentor_search import MentorSearch
 
 # --- Helper to convert lists to numpy arrays ---
 def _as_np(v): 
     return np.array(v, dtype=float)
 
+# --- Helper: catalogs as pre-normalized matrices ---
+def _as_catalog(items, text_fn=None):
+    """Loaders return VectorCatalogs already; plain lists of dicts are converted here."""
+    if getattr(items, "matrix", None) is not None:
+        return items
+    return VectorCatalog.from_rows(list(items), text_fn=text_fn)
 
-# =====================================================
-# 1️⃣ ROLE RECOMMENDATION
-# =====================================================
-def role_recommendations(employee: dict, roles: list, top_k: int = 5) -> list:
-    """
-    Always return top_k best matches (no hard min threshold).
-    Include the final score so upstream can sort or display.
-    """
-    from embeddings import embed_text, cosine
+def _has_engine(cat) -> bool:
+    """Catalog searched through an ANN / BM25 engine rather than an exact scan (see VectorCatalog.search)."""
+    ann = getattr(cat, "ann", None)
+    return getattr(cat, "lexical", None) is not None or (ann is not None and ann.kind != "exact")
 
+def role_text(r: Dict) -> str:
+    return " ".join(filter(None, [
+        r.get("role",""),
+        " ".join(r.get("skills", [])[:10]),
+        r.get("summary","")
+    ]))
+
+
+def role_query_text(employee: Dict) -> str:
     # build query text from richer signals
-    q = " ".join([
+    return " ".join([
         employee.get("job_title",""),
         " ".join(employee.get("top_skills", [])[:8]),
         " ".join([p.get("title","") for p in employee.get("projects", [])[:3]])
     ]).strip() or employee.get("job_title","")
-    qv = embed_text(q)
 
-    scored = []
-    for r in roles:
-        # concat role text
-        rtxt = " ".join(filter(None, [
-            r.get("role",""),
-            " ".join(r.get("skills", [])[:10]),
-            r.get("summary","")
-        ]))
-        rv = r.get("vector") or embed_text(rtxt)  # if you stored vectors, use them; else embed on the fly
-        s = cosine(qv, rv)
-        scored.append({"role_id": r["id"], "role": r.get("role",""), "score": float(s)})
 
-    scored.sort(key=lambda x: x["score"], reverse=True)
-    return scored[:top_k]
+def profile_text(employee: dict) -> Optional[str]:
+    """
+    Text the employee's profile vector was embedded from (ProfileIngestor caches it), else
+    the same fields rebuilt from a processed profile; None when neither is available.
+    """
+    if employee.get("profile_text"):
+        return employee["profile_text"]
+    if not (employee.get("job_title") or employee.get("skills")):
+        return None
+    return " | ".join([
+        employee.get("job_title", ""), employee.get("department", ""),
+        "skills: " + ", ".join(employee.get("skills", [])),
+        "competencies: " + ", ".join(employee.get("competencies", [])),
+    ])
+
+
+# =====================================================
+# 1️⃣ ROLE RECOMMENDATION
+# =====================================================
+def role_recommendations(employee: dict, roles: list, top_k: int = 5) -> list:
+    """
+    Always return top_k best matches (no hard min threshold).
+    Include the final score so upstream can sort or display.
+    """
+    # profiles ingested by ProfileIngestor carry a cached query vector (no embedding call);
+    # loaders guarantee a complete pre-normalized role matrix, so scoring is one
+    # matrix-vector product (plain lists are converted in bulk)
+    q = employee.get("query_text") or role_query_text(employee)
+    qv = employee.get("query_vector") or embed_text(q)
+    cat = _as_catalog(roles, text_fn=role_text)
+    idx, scores = cat.search(qv, top_k, text=q)  # hybrid when the catalog has a lexical index
+    return [
+        {"role_id": cat[i]["id"], "role": cat[i].get("role",""), "score": float(s)}
+        for i, s in zip(idx, scores)
+    ]
 
 
 # =====================================================
 # 2️⃣ SKILL GAP ANALYSIS
 # =====================================================
-def skill_gaps(employee: Dict, target_role: Dict, top_k: int = 6) -> List[Dict]:
+def skill_gaps(employee: Dict, target_role: Dict, top_k: int = 6,
+               skill_vectors: Optional[SkillVectorStore] = None) -> List[Dict]:
     """
     Compare an employee’s overall vector with each required skill vector of a role.
     Return the skills farthest from the employee (biggest gaps).
+    skill_vectors: precomputed vocabulary store; without it the skills are embedded here.
     """
     e_vec = _as_np(employee["vector"])
     reqs = normalize_list(target_role.get("required_skills", []))
+    if not reqs:
+        return []
 
-    gaps = []
-    for skill in reqs:
-        s_vec = embed_text(skill)
-        gap_score = (1 - cosine(e_vec, s_vec)) * 100
-        gaps.append({"skill": skill, "gap_score": round(gap_score, 1)})
-
-    # Sort by largest gap first
-    return sorted(gaps, key=lambda x: x["gap_score"], reverse=True)[:top_k]
+    # largest gap == lowest cosine, so rank the skills against the negated employee vector
+    skill_mat = skill_vectors.matrix_for(reqs) if skill_vectors is not None else normalize_rows(embed_many(reqs))
+    idx, neg_sims = topk(-e_vec, skill_mat, top_k)
+    return [
+        {"skill": reqs[i], "gap_score": round(float((1 + s) * 100), 1)}
+        for i, s in zip(idx, neg_sims)
+    ]
 
 
 # =====================================================
@@ -77,33 +114,35 @@ def skill_gaps(employee: Dict, target_role: Dict, top_k: int = 6) -> List[Dict]:
 def top_courses_for_gaps(gaps: List[Dict], course_index: List[Dict], top_k: int = 5) -> List[Dict]:
     """
     Find courses whose required_skills overlap with the employee's biggest gaps.
+    Loaded course catalogs carry a prebuilt `skill_index`; plain lists get one here.
     """
     needed = set(g["skill"].lower() for g in gaps[:4])
-    scored = []
-
-    for c in course_index:
-        tags = set(normalize_list(c.get("required_skills", [])))
-        overlap = len(needed.intersection(tags)) / max(1, len(needed))
-        scored.append({**c, "match_score": round(100 * overlap, 1)})
-
-    return sorted(scored, key=lambda x: x["match_score"], reverse=True)[:top_k]
+    index = getattr(course_index, "skill_index", None) or InvertedSkillIndex(course_index)
+    return [
+        {**index.rows[pos], "match_score": round(100 * hits / max(1, len(needed)), 1)}
+        for pos, hits in index.top(needed, top_k)
+    ]
 
 
 # =====================================================
 # 4️⃣ MENTOR MATCHING
 # =====================================================
-def top_mentors(employee: Dict, mentor_index: List[Dict], top_k: int = 3) -> List[Dict]:
+def top_mentors(employee: Dict, mentor_index: List[Dict], top_k: int = 3,
+                departments: Optional[List[str]] = None, levels: Optional[List[str]] = None,
+                available_only: bool = False, exclude_self: bool = True) -> List[Dict]:
     """
-    Rank mentors by vector similarity to the employee.
+    Rank mentors by vector similarity to the employee, optionally only within the
+    given departments / job levels (see mentor_search.JOB_LEVELS) and available
+    mentors. The employee is never their own mentor unless exclude_self=False.
+    Returns lightweight records (no vectors).
     """
-    e_vec = _as_np(employee["vector"])
-    ranked = []
-
-    for m in mentor_index:
-        sim = cosine(e_vec, _as_np(m["vector"]))
-        ranked.append({**m, "match_score": round(100 * sim, 1)})
-
-    return sorted(ranked, key=lambda x: x["match_score"], reverse=True)[:top_k]
+    search = getattr(mentor_index, "mentor_search", None) or MentorSearch(_as_catalog(mentor_index))
+    idx, sims = search.search(
+        employee["vector"], top_k, text=profile_text(employee),
+        exclude_ids=[employee.get("employee_id")] if exclude_self else (),
+        departments=departments, levels=levels, available_only=available_only,
+    )
+    return search.records(idx, sims)
 
 
 # =====================================================
@@ -149,4 +188,66 @@ def assemble_plan(employee: Dict, role_hit: Dict,
             },
         ],
     }
-    return plan
\ No newline at end of file
+    return plan
+
+
+# =====================================================
+# 6️⃣ BATCH VARIANTS (many employees at once)
+# Results equal the single-employee functions: catalogs with a search engine (ANN /
+# lexical prefilter) are searched per employee through it, plain ones in one product.
+# =====================================================
+def role_recommendations_many(employees: List[Dict], roles: list, top_k: int = 5) -> List[List[Dict]]:
+    """role_recommendations for a list of employees: one matrix product over all query vectors."""
+    if not employees:
+        return []
+    cat = _as_catalog(roles, text_fn=role_text)
+    # cached query vectors where present; the rest embedded in bulk (distinct texts once)
+    texts = [None if e.get("query_vector") else role_query_text(e) for e in employees]
+    uniq = list(dict.fromkeys(t for t in texts if t is not None))
+    vecs = dict(zip(uniq, embed_many(uniq))) if uniq else {}
+    queries = [e["query_vector"] if t is None else vecs[t] for e, t in zip(employees, texts)]
+    if _has_engine(cat):
+        return [role_recommendations({**e, "query_vector": q}, cat, top_k) for e, q in zip(employees, queries)]
+    idx, scores = topk_many(queries, cat.matrix, top_k)
+    return [
+        [{"role_id": cat[i]["id"], "role": cat[i].get("role",""), "score": float(s)}
+         for i, s in zip(row_idx, row_scores) if i >= 0]
+        for row_idx, row_scores in zip(idx, scores)
+    ]
+
+def skill_gaps_many(employees: List[Dict], target_roles: List[Dict], top_k: int = 6,
+                    skill_vectors: Optional[SkillVectorStore] = None) -> List[List[Dict]]:
+    """skill_gaps per (employee, target role) pair; employees sharing a role are scored in one product."""
+    groups: Dict[int, List[int]] = {}
+    for n, role in enumerate(target_roles):
+        groups.setdefault(id(role), []).append(n)
+
+    out: List[List[Dict]] = [[] for _ in employees]
+    for members in groups.values():
+        reqs = normalize_list(target_roles[members[0]].get("required_skills", []))
+        if not reqs:
+            continue
+        skill_mat = skill_vectors.matrix_for(reqs) if skill_vectors is not None else normalize_rows(embed_many(reqs))
+        e_mat = normalize_rows([employees[n]["vector"] for n in members])
+        idx, neg_sims = topk_many(-e_mat, skill_mat, top_k)
+        for n, row_idx, row_sims in zip(members, idx, neg_sims):
+            out[n] = [{"skill": reqs[i], "gap_score": round(float((1 + s) * 100), 1)}
+                      for i, s in zip(row_idx, row_sims) if i >= 0]
+    return out
+
+def top_mentors_many(employees: List[Dict], mentor_index: List[Dict], top_k: int = 3,
+                     departments: Optional[List[str]] = None, levels: Optional[List[str]] = None,
+                     available_only: bool = False, exclude_self: bool = True) -> List[List[Dict]]:
+    """top_mentors for a list of employees with one matrix-matrix product per chunk."""
+    if not employees:
+        return []
+    search = getattr(mentor_index, "mentor_search", None) or MentorSearch(_as_catalog(mentor_index))
+    if _has_engine(search.catalog) and search.mask(departments, levels, available_only) is None:
+        # unfiltered queries take the catalog's engine in top_mentors
+        return [top_mentors(e, mentor_index, top_k, exclude_self=exclude_self) for e in employees]
+    idx, sims = search.search_many(
+        [e["vector"] for e in employees], top_k,
+        exclude_ids=[e.get("employee_id") for e in employees] if exclude_self else None,
+        departments=departments, levels=levels, available_only=available_only,
+    )
+    return [search.records(row_idx, row_sims) for row_idx, row_sims in zip(idx, sims)]
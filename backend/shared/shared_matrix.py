@@ -0,0 +1,128 @@
+# backend/shared/shared_matrix.py
+"""
+Publish catalog matrices once per node in POSIX shared memory and let every
+worker process (gunicorn / multiple Flask workers) attach to the same pages
+read-only, so memory stays flat as workers are added.
+
+Segment layout: a 64-byte header (ready flag, rows, dims) followed by the
+C-contiguous float32 matrix. The first process to publish a key creates the
+segment and unlinks it at exit; later processes attach and never unlink it.
+A complete segment left behind by a hard-killed creator is simply re-attached
+by the next process that publishes the same key; one whose creator died before
+marking it ready is unlinked and recreated after `timeout`, and if that also
+fails the caller gets its private matrix back instead of an error.
+Memory-mapped .npy indices are already shared through the page cache and do
+not need this.
+"""
+import atexit, hashlib, os, sys, time
+from multiprocessing import shared_memory
+from typing import Dict
+
+import numpy as np
+
+CATALOG_SHARED_MEMORY = os.getenv("CATALOG_SHARED_MEMORY", "true").lower() == "true"
+
+_HEADER = 64
+_READY = b"PSAREADY"
+_segments: Dict[str, shared_memory.SharedMemory] = {}  # keep mappings alive for the process lifetime
+_owned = set()  # segment names this process created (and unlinks at exit)
+
+@atexit.register
+def _release_owned():
+    # unlink only removes the name: workers already attached keep their mapping
+    for name in _owned:
+        _unlink(name)
+
+def _unlink(name: str):
+    # shm_unlink directly: SharedMemory.unlink() would also unregister the name from a
+    # resource tracker we never registered it with (see _open), and it needs a sized segment
+    try:
+        import _posixshmem
+        _posixshmem.shm_unlink("/" + name)
+    except (ImportError, OSError):
+        pass
+
+def _segment_name(key: str) -> str:
+    # short, filesystem-safe, and different for every (catalog, content version)
+    return "psa_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+def _open(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    """
+    Open a segment without resource-tracker ownership. Forked workers can share one
+    tracker, so tracker-based cleanup is unreliable; creators unlink explicitly at exit.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+    from multiprocessing import resource_tracker
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+def _view(shm: shared_memory.SharedMemory, rows: int, dims: int) -> np.ndarray:
+    arr = np.ndarray((rows, dims), dtype=np.float32, buffer=shm.buf, offset=_HEADER)
+    arr.flags.writeable = False
+    return arr
+
+def share_matrix(key: str, matrix: np.ndarray, timeout: float = 30.0) -> np.ndarray:
+    """
+    Return a read-only view of `matrix` backed by the node-wide segment for `key`,
+    creating and filling the segment if no process has published it yet.
+    `key` must change whenever the matrix contents change (e.g. include a checksum).
+    """
+    name = _segment_name(key)
+    if name in _segments:
+        shm = _segments[name]
+        rows, dims = np.frombuffer(shm.buf, dtype=np.int64, count=2, offset=8)
+        return _view(shm, int(rows), int(dims))
+
+    src = np.ascontiguousarray(matrix, dtype=np.float32)
+    if src.ndim != 2:
+        src = src.reshape(src.shape[0], -1)
+    rows, dims = src.shape
+    for attempt in range(2):
+        try:
+            shm = _open(name, create=True, size=_HEADER + max(src.nbytes, 1))
+            np.ndarray((rows, dims), dtype=np.float32, buffer=shm.buf, offset=_HEADER)[...] = src
+            shm.buf[8:24] = np.array([rows, dims], dtype=np.int64).tobytes()
+            shm.buf[:8] = _READY  # flag last, so attachers never see a half-written matrix
+            _owned.add(name)
+            break
+        except FileExistsError:
+            shm = _wait_ready(name, timeout)
+            if shm is not None:
+                break
+            # the creator died before marking it ready: drop the name and publish afresh
+            print(f"[WARN] Shared catalog segment {name} was never marked ready; recreating it")
+            _unlink(name)
+    else:
+        print(f"[WARN] Could not publish shared catalog segment {name}; using a private copy")
+        src.flags.writeable = False
+        return src
+    got = tuple(int(x) for x in np.frombuffer(shm.buf, dtype=np.int64, count=2, offset=8))
+    if got != (rows, dims):
+        raise ValueError(f"Shared catalog segment {name} holds {got}, expected {(rows, dims)}")
+    _segments[name] = shm
+    return _view(shm, rows, dims)
+
+def _wait_ready(name: str, timeout: float):
+    """The attached segment once its creator marks it ready, or None after `timeout`."""
+    deadline = time.monotonic() + timeout
+    shm = None
+    while shm is None or bytes(shm.buf[:8]) != _READY:
+        if time.monotonic() > deadline:
+            if shm is not None:
+                shm.close()
+            return None
+        if shm is None:
+            try:
+                shm = _open(name)
+            except ValueError:
+                pass  # creator has not sized the segment yet
+            except FileNotFoundError:
+                return None  # unlinked meanwhile (e.g. by another process replacing it)
+        time.sleep(0.01)
+    return shm
+
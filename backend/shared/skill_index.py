@@ -0,0 +1,53 @@
+# backend/shared/skill_index.py
+"""
+Inverted index from normalized skill to the catalog rows that list it.
+
+Rows are normalized once when the index is built (at catalog load) into the
+shared integer skill ids (skill_normalizer.VOCAB), and every id maps to a
+sorted int array of row positions.
+Overlap scoring for a handful of query skills then only touches the rows that
+share at least one of them, independent of catalog size.
+"""
+import heapq, os, sys
+from itertools import islice
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Add the current directory to the path so we can import from shared modules
+sys.path.append(os.path.dirname(__file__))
+
+from skill_normalizer import VOCAB
+
+
+class InvertedSkillIndex:
+
+    def __init__(self, rows: List[Dict], field: str = "required_skills"):
+        self.rows = rows
+        postings: Dict[int, List[int]] = {}
+        for pos, row in enumerate(rows):
+            for sid in VOCAB.encode(row.get(field, [])).tolist():
+                postings.setdefault(sid, []).append(pos)
+        # skill id (shared VOCAB) -> sorted row positions
+        self.postings: Dict[int, np.ndarray] = {sid: np.asarray(p, dtype=np.int64) for sid, p in postings.items()}
+
+    def overlap(self, skills: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(row positions, number of `skills` each row lists) for rows sharing at least one skill."""
+        ids = VOCAB.encode(list(skills), add=False).tolist()
+        lists = [self.postings[sid] for sid in ids if sid in self.postings]
+        if not lists:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(lists), return_counts=True)
+
+    def top(self, skills: Iterable[str], k: int) -> List[Tuple[int, int]]:
+        """
+        Best k (row position, overlap count) pairs, highest overlap first and catalog
+        order among ties. Rows without any overlap fill the remaining slots with count 0.
+        """
+        rows, counts = self.overlap(skills)
+        best = heapq.nlargest(k, zip(counts.tolist(), (-rows).tolist()))
+        out = [(-neg_pos, int(c)) for c, neg_pos in best]
+        if len(out) < k:
+            hit = set(rows.tolist())
+            out += islice(((pos, 0) for pos in range(len(self.rows)) if pos not in hit), k - len(out))
+        return out
@@ -1,15 +1,149 @@
-import re
+import json, os, re, threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
 
 STOPWORDS = {"and", "&", "/", "-", "of", "for", "in", "to"} 
+_SEPARATORS = re.compile(r"[\s/\-]+")
+
+# alias -> canonical skill (both sides normalized), e.g. "k8s" -> "kubernetes"
+SKILL_ALIASES_PATH = Path(os.getenv("SKILL_ALIASES_PATH", Path(__file__).parent / ".." / "data" / "skill_aliases.json"))
+SKILL_NORMALIZE_CACHE = int(os.getenv("SKILL_NORMALIZE_CACHE", "65536"))
+_aliases = {}
+
+def _canonical(s: str) -> str:
+    s = s.lower().strip().replace("&", "and")
+    return " ".join(w for w in _SEPARATORS.sub(" ", s).split() if w not in STOPWORDS)
+
+@lru_cache(maxsize=SKILL_NORMALIZE_CACHE)
+def _normalize_cached(s: str) -> str:
+    canon = _canonical(s)
+    return _aliases.get(canon, canon)
 
 def normalize_skill(s: str) -> str:
     if not s: return ""
-    s = s.lower().strip()
-    s = s.replace("&", "and")
-    s = re.sub(r"[\s/]+", " ", s)
-    s = s.replace("-", " ")
-    s = " ".join(w for w in s.split() if w not in STOPWORDS)
-    return s
+    return _normalize_cached(s)
 
 def normalize_list(skills):
-    return [normalize_skill(x) for x in (skills or []) if normalize_skill(x)]
\ No newline at end of file
+    out = [normalize_skill(x) for x in (skills or [])]
+    return [x for x in out if x]
+
+def set_aliases(mapping):
+    """Replace the synonym table ({alias: canonical}); clears the normalization cache."""
+    global _aliases
+    _aliases = {_canonical(k): _canonical(v) for k, v in (mapping or {}).items() if _canonical(k) and _canonical(v)}
+    _normalize_cached.cache_clear()
+
+def load_aliases(path=None):
+    """Load the synonym table from JSON ({"k8s": "kubernetes", ...}); a missing file means no aliases."""
+    p = Path(path) if path else SKILL_ALIASES_PATH
+    if p.exists():
+        with open(p, "r", encoding="utf-8") as f:
+            set_aliases(json.load(f))
+    return dict(_aliases)
+
+load_aliases()
+
+# --- bulk normalization (catalog builds) ---
+def normalize_column(values):
+    """
+    Normalize a whole column (list, numpy array or pandas Series of strings) with one
+    normalization per distinct value. Returns a numpy object array, or a Series with
+    the same index for Series input; non-strings become "".
+    """
+    arr = np.asarray(values, dtype=object)
+    flat = np.array([v if isinstance(v, str) else "" for v in arr.ravel()], dtype=object)
+    uniq, inverse = np.unique(flat, return_inverse=True) if flat.size else (flat, np.empty(0, dtype=np.int64))
+    out = np.array([normalize_skill(u) for u in uniq] or [], dtype=object)[inverse].reshape(arr.shape)
+    if hasattr(values, "iloc"):  # pandas Series
+        return type(values)(out, index=values.index, name=getattr(values, "name", None))
+    return out
+
+def normalize_lists(column):
+    """normalize_list over a column of skill lists (e.g. a DataFrame column) in one bulk pass."""
+    lists = [list(x) if x is not None and not isinstance(x, str) else ([x] if x else []) for x in column]
+    bounds = np.cumsum([0] + [len(x) for x in lists])
+    flat = normalize_column([s for x in lists for s in x])
+    return [[s for s in flat[bounds[i]:bounds[i + 1]] if s] for i in range(len(lists))]
+
+# --- integer skill vocabulary + bitset overlap (shared by recommender and services) ---
+
+class SkillVocabulary:
+    """
+    Interns canonical (normalize_skill) skill names to dense integer ids, so skill
+    sets become packed bitsets: bit i set <=> the set contains skill id i.
+    Ids only ever grow, so bitsets packed earlier stay valid (missing bits are 0).
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.skills = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.skills)
+
+    def intern(self, skill: str) -> int:
+        """Id of a canonical skill name, assigning the next id on first sight."""
+        sid = self.ids.get(skill)
+        if sid is None:
+            with self._lock:
+                sid = self.ids.setdefault(skill, len(self.skills))
+                if sid == len(self.skills):
+                    self.skills.append(skill)
+        return sid
+
+    def encode(self, skills, add: bool = True) -> np.ndarray:
+        """Sorted unique ids of `skills` (raw names; normalized here). add=False skips unknown skills."""
+        canon = normalize_list(skills)
+        ids = [self.intern(s) for s in canon] if add else [self.ids[s] for s in canon if s in self.ids]
+        return np.unique(np.asarray(ids, dtype=np.int64))
+
+    def bitset(self, skills, nbytes: int = None, add: bool = True) -> np.ndarray:
+        """One skill set as a packed uint8 bitset (little bit order)."""
+        return self.bitsets([skills], nbytes, add)[0]
+
+    def bitsets(self, skill_lists, nbytes: int = None, add: bool = True) -> np.ndarray:
+        """
+        (len(skill_lists), nbytes) packed bitsets, one row per skill list. Use add=False
+        for query-side sets (e.g. a user's skills): unknown skills cannot overlap any
+        catalog row, and interning them would grow the vocabulary without bound.
+        """
+        encoded = [self.encode(s, add) for s in skill_lists]
+        nbytes = max(nbytes or 0, (len(self) + 7) // 8, 1)
+        bits = np.zeros((len(encoded), nbytes * 8), dtype=bool)
+        for row, ids in enumerate(encoded):
+            bits[row, ids] = True
+        return np.packbits(bits, axis=1, bitorder="little")
+
+VOCAB = SkillVocabulary()
+
+def _align(a: np.ndarray, b: np.ndarray):
+    # bitsets packed at different vocabulary sizes: pad the narrower with zero bytes
+    width = max(a.shape[-1], b.shape[-1])
+    pad = lambda x: x if x.shape[-1] == width else \
+        np.pad(x, [(0, 0)] * (x.ndim - 1) + [(0, width - x.shape[-1])])
+    return pad(a), pad(b)
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """Set bits per row of a packed bitset matrix (or in a single bitset)."""
+    counts = np.bitwise_count(bits) if hasattr(np, "bitwise_count") else _POPCOUNT8[bits]  # numpy < 2.0
+    return counts.sum(axis=-1, dtype=np.int64)
+
+def overlap_stats(user_bits: np.ndarray, catalog_bits: np.ndarray) -> dict:
+    """
+    One user's skill bitset against every row of a catalog bitset matrix, in one pass:
+    overlap (shared skills), required (row size), coverage (overlap / required, 0 for
+    empty rows) and jaccard.
+    """
+    user_bits, catalog_bits = _align(np.atleast_1d(user_bits), np.atleast_2d(catalog_bits))
+    overlap = popcount(catalog_bits & user_bits)
+    required = popcount(catalog_bits)
+    union = popcount(catalog_bits | user_bits)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        coverage = np.where(required > 0, overlap / required, 0.0)
+        jaccard = np.where(union > 0, overlap / union, 0.0)
+    return {"overlap": overlap, "required": required, "coverage": coverage, "jaccard": jaccard}
@@ -0,0 +1,68 @@
+# backend/shared/skill_vectors.py
+"""
+Vector lookup for normalized skill names.
+
+The catalog build embeds the whole skill vocabulary (role, course and profile
+skills) into index_skills; services load it as a matrix and look skills up by
+name instead of embedding them per request. Skills outside the vocabulary are
+embedded once, in bulk, and appended to a small durable side store so later
+requests and restarts find them too (the next catalog build folds them in).
+"""
+import os, sys, threading
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+# Add the current directory to the path so we can import from shared modules
+sys.path.append(os.path.dirname(__file__))
+
+from embeddings import embed_many, get_provider, normalize_rows, VectorCatalog
+from checkpoint import SegmentCheckpoint
+
+
+class SkillVectorStore:
+    """skill name -> unit vector, backed by the skills catalog matrix plus lazily embedded extras."""
+
+    def __init__(self, catalog: Optional[VectorCatalog] = None,
+                 extras_dir: Optional[Union[str, Path]] = None):
+        self.catalog = catalog if catalog is not None else VectorCatalog([], np.zeros((0, 0), dtype=np.float32))
+        self._index: Dict[str, int] = {r["skill"]: i for i, r in enumerate(self.catalog)}
+        # extras are provider specific: a different embedding backend starts a fresh store
+        self._extras_store = SegmentCheckpoint(Path(extras_dir) / get_provider().name) if extras_dir else None
+        self._extras: Dict[str, np.ndarray] = {}
+        if self._extras_store:
+            for skill, vec in self._extras_store.load().items():
+                self._extras[skill] = np.asarray(vec, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index) + len(self._extras)
+
+    def __contains__(self, skill: str) -> bool:
+        return skill in self._index or skill in self._extras
+
+    def extras(self) -> List[str]:
+        return list(self._extras)
+
+    def _embed_missing(self, skills: List[str]):
+        with self._lock:
+            todo = list(dict.fromkeys(s for s in skills if s not in self))
+            if not todo:
+                return
+            got = dict(zip(todo, normalize_rows(embed_many(todo))))
+            if self._extras_store:
+                self._extras_store.append({s: v.tolist() for s, v in got.items()})
+            self._extras.update(got)
+
+    def matrix_for(self, skills: List[str]) -> np.ndarray:
+        """Unit vectors for `skills` as one (len(skills), dims) float32 matrix, in order."""
+        if not skills:
+            return np.zeros((0, self.catalog.matrix.shape[1] if self.catalog.matrix.ndim == 2 else 0),
+                            dtype=np.float32)
+        self._embed_missing(skills)
+        idx = np.array([self._index.get(s, -1) for s in skills], dtype=np.int64)
+        if (idx >= 0).all():
+            return np.asarray(self.catalog.matrix[idx], dtype=np.float32)
+        return np.stack([self.catalog.matrix[i] if i >= 0 else self._extras[s] for s, i in zip(skills, idx)]) \
+            .astype(np.float32, copy=False)